@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+In-process fake of Box View API for benchmarks. Serves documents,
+thumbnail, content, sessions and settings endpoints from memory with
+configurable latency, payload sizes and share of `429` responses.
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import threading
+import datetime
+
+from six.moves import BaseHTTPServer, socketserver
+
+__all__ = ['FakeServer']
+
+CHUNK_SIZE = 64 * 1024
+
+DOCUMENT_RE = re.compile(r'^/1/documents/([^/]+)$')
+THUMBNAIL_RE = re.compile(r'^/1/documents/([^/]+)/thumbnail$')
+CONTENT_RE = re.compile(r'^/1/documents/([^/]+)/content(\.pdf|\.zip|\.txt)?$')
+SESSION_RE = re.compile(r'^/1/sessions/([^/]+)$')
+SETTINGS_RE = re.compile(r'^/1/settings/(webhook|storage-profile)$')
+
+
+def _now():
+    return datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class _HTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, don't let Nagle's algorithm
+    # and delayed ACK add 40ms to every response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def _drain(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = []
+        while length > 0:
+            chunk = self.rfile.read(min(length, CHUNK_SIZE))
+            if not chunk:
+                break
+            if len(body) < 16:  # json bodies are small, uploads are not
+                body.append(chunk)
+            length -= len(chunk)
+        return b''.join(body)
+
+    def _send(self, status, body=b'', headers=None, head=False):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and not head:
+            self.wfile.write(body)
+
+    def _send_json(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        self._send(status, body, {'Content-Type': 'application/json'})
+
+    def _send_content(self, payload, mimetype, head=False):
+        headers = {'Content-Type': mimetype, 'Accept-Ranges': 'bytes',
+                   'ETag': '"{}"'.format(len(payload))}
+        match = re.match(r'^bytes=(\d+)-(\d*)$',
+                         self.headers.get('Range') or '')
+        if match is None:
+            return self._send(200, payload, headers, head)
+        start = int(match.group(1))
+        end = int(match.group(2) or len(payload) - 1)
+        if start >= len(payload):
+            return self._send(416, b'', headers, head)
+        headers['Content-Range'] = 'bytes {}-{}/{}'.format(
+            start, end, len(payload))
+        self._send(206, payload[start:end + 1], headers, head)
+
+    def _handle(self, method):
+        body = self._drain()
+        fake = self.fake
+        fake.count()
+        if fake.latency:
+            time.sleep(fake.latency)
+        if fake.throttle and random.random() < fake.throttle:
+            return self._send(429, b'', {'Retry-After': str(fake.retry_after)})
+
+        path = self.path.split('?', 1)[0]
+        head = method == 'HEAD'
+
+        if path == '/1/documents':
+            if method == 'POST':
+                return self._send_json(201, fake.create_document(body))
+            if method == 'GET':
+                return self._send_json(200, fake.list_documents())
+
+        match = DOCUMENT_RE.match(path)
+        if match:
+            if method == 'DELETE':
+                return self._send(204)
+            return self._send_json(200, fake.document(match.group(1)))
+
+        if THUMBNAIL_RE.match(path) and method == 'GET':
+            return self._send_content(fake.thumbnail, 'image/png')
+
+        if CONTENT_RE.match(path) and method in ('GET', 'HEAD'):
+            return self._send_content(fake.content, 'application/pdf', head)
+
+        if path == '/1/sessions' and method == 'POST':
+            return self._send_json(201, fake.create_session())
+
+        if SESSION_RE.match(path) and method == 'DELETE':
+            return self._send(204)
+
+        match = SETTINGS_RE.match(path)
+        if match:
+            if method == 'DELETE':
+                return self._send(204)
+            status = 201 if method == 'POST' else 200
+            return self._send_json(status, fake.settings(match.group(1)))
+
+        self._send_json(404, {'message': 'Not found'})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_HEAD(self):
+        self._handle('HEAD')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+class FakeServer(object):
+    """
+    Fake Box View API listening on `127.0.0.1`. Every response is delayed
+    by `latency` seconds and `throttle` share of requests (0..1) is
+    rejected with `429` and `Retry-After: <retry_after>`:
+
+        with FakeServer(latency=0.005) as server:
+            api = BoxView('key', base_url=server.api_url,
+                          upload_url=server.api_url)
+    """
+
+    def __init__(self,
+                 latency=0.0,
+                 thumbnail_size=8 * 1024,
+                 content_size=1024 * 1024,
+                 throttle=0.0,
+                 retry_after=0,
+                 port=0):
+        self.latency = latency
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.thumbnail = b'\x89PNG' + b'\0' * max(0, thumbnail_size - 4)
+        self.content = b'%PDF' + b'\0' * max(0, content_size - 4)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = _HTTPServer(('127.0.0.1', port), _Handler)
+        self.server.fake = self
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self.server.server_address[1])
+
+    @property
+    def api_url(self):
+        return self.url + '1/'
+
+    def count(self):
+        with self.lock:
+            self.requests += 1
+
+    def document(self, document_id, name=''):
+        return {
+            'type': 'document',
+            'id': document_id,
+            'status': 'done',
+            'name': name,
+            'created_at': _now(),
+            'modified_at': _now(),
+        }
+
+    def create_document(self, body):
+        try:
+            name = json.loads(body.decode('utf-8')).get('name', '')
+        except ValueError:
+            name = ''  # multipart upload
+        return self.document(uuid.uuid4().hex, name)
+
+    def list_documents(self):
+        entries = [self.document(uuid.uuid4().hex) for _ in range(10)]
+        return {'document_collection': {'total_count': len(entries),
+                                        'entries': entries}}
+
+    def create_session(self):
+        session_id = uuid.uuid4().hex
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+        return {
+            'type': 'session',
+            'id': session_id,
+            'expires_at': expires_at.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'urls': {
+                'view': '{}sessions/{}/view'.format(self.api_url, session_id),
+                'assets': '{}sessions/{}/assets/'.format(self.api_url,
+                                                         session_id),
+                'realtime': '{}sse/{}'.format(self.url, session_id),
+            },
+        }
+
+    def settings(self, name):
+        if name == 'webhook':
+            return {'url': 'http://example.com/webhook'}
+        return {'provider': 'S3', 's3_bucket_name': 'bucket'}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures cold import of `boxview` plus url building in fresh interpreters
+and fails when the median exceeds the budget:
+
+    python benchmarks/import_time.py --runs 20 --budget 30
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# HTTP stack must not be imported before the first request
+HEAVY_MODULES = ['requests', 'urllib3', 'cgi', 'sqlite3']
+
+SCRIPT = '''
+import sys, json, time
+started = time.time()
+import boxview
+boxview.BoxView.get_session_url('4fba9eda0dd745d491ad0b98e224aa25')
+boxview.BoxView.get_realtime_url('4fba9eda0dd745d491ad0b98e224aa25')
+elapsed = time.time() - started
+print(json.dumps({{'elapsed': elapsed,
+                  'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+'''.format(heavy=HEAVY_MODULES)
+
+
+def measure():
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT],
+                                     cwd=ROOT)
+    return json.loads(output.decode('utf-8'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget', type=float, default=30.0,
+                        help='allowed median, milliseconds')
+    args = parser.parse_args(argv)
+
+    measure()  # warm up, e.g. write bytecode cache
+    results = [measure() for _ in range(args.runs)]
+    times = sorted(result['elapsed'] * 1000 for result in results)
+    median = times[len(times) // 2]
+    loaded = sorted(set(m for result in results for m in result['loaded']))
+
+    print('import boxview: min {:.1f} ms, median {:.1f} ms, '
+          'max {:.1f} ms (budget {:.1f} ms)'.format(
+              times[0], median, times[-1], args.budget))
+    if loaded:
+        print('imported eagerly: {}'.format(', '.join(loaded)))
+    return 1 if median > args.budget or loaded else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
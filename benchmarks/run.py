@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures client throughput and latency against in-process fake server:
+
+    python benchmarks/run.py --requests 2000 --concurrency 16 --latency 0.002
+
+Every scenario reports successful requests per second, p50/p99 latency of
+one call and peak RSS of the process (fake server included) after the
+scenario.
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from boxview import BoxView, RetryPolicy  # noqa: E402
+from boxview.ratelimit import monotonic  # noqa: E402
+from boxview.utils import iter_concurrent  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+from fake_server import FakeServer  # noqa: E402
+
+DOCUMENT_ID = '2da6cf9261824fb0a4fe532f94d14625'
+
+
+def peak_rss():
+    """ Peak resident set size of the process in bytes. """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100.0))]
+
+
+def _round(value, scale=1, digits=3):
+    return None if value is None else round(value * scale, digits)
+
+
+def scenarios(api, upload_path):
+    def _upload(i):
+        return api.create_document_from_file(upload_path, name=str(i))
+
+    def _metadata(i):
+        return api.get_document(DOCUMENT_ID)
+
+    def _thumbnail(i):
+        return api.get_thumbnail_to_string(DOCUMENT_ID, 100, 100)
+
+    def _content(i):
+        with open(os.devnull, 'wb') as fp:
+            return api.get_document_content(fp, DOCUMENT_ID)
+
+    def _session(i):
+        return api.create_session(DOCUMENT_ID, duration=60)
+
+    return [
+        ('upload', _upload),
+        ('metadata', _metadata),
+        ('thumbnail', _thumbnail),
+        ('content', _content),
+        ('session', _session),
+    ]
+
+
+def run_scenario(func, requests, concurrency):
+    def _timed(i):
+        started = monotonic()
+        func(i)
+        return monotonic() - started
+
+    latencies, errors = [], 0
+    started = monotonic()
+    for _, result in iter_concurrent(_timed, range(requests), concurrency):
+        if isinstance(result, Exception):
+            errors += 1
+        else:
+            latencies.append(result)
+    elapsed = monotonic() - started
+
+    # failed calls don't count towards throughput
+    return {
+        'requests': requests,
+        'errors': errors,
+        'elapsed': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': _round(percentile(latencies, 50), 1000),
+        'p99_ms': _round(percentile(latencies, 99), 1000),
+        'peak_rss_mb': _round(peak_rss(), 1 / 1024.0 / 1024, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='calls per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='server delay of every response, seconds')
+    parser.add_argument('--throttle', type=float, default=0.0,
+                        help='share of requests rejected with 429 (0..1)')
+    parser.add_argument('--thumbnail-size', type=int, default=8 * 1024)
+    parser.add_argument('--content-size', type=int, default=1024 * 1024)
+    parser.add_argument('--upload-size', type=int, default=1024 * 1024)
+    parser.add_argument('--transport', choices=['requests', 'urllib3'],
+                        default='requests')
+    parser.add_argument('--scenario', action='append',
+                        help='run only given scenario (may be repeated)')
+    parser.add_argument('--json', action='store_true',
+                        help='print results as json lines')
+    args = parser.parse_args(argv)
+
+    server = FakeServer(latency=args.latency,
+                        thumbnail_size=args.thumbnail_size,
+                        content_size=args.content_size,
+                        throttle=args.throttle)
+
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as upload, server:
+        upload.write(b'%PDF' + b'\0' * max(0, args.upload_size - 4))
+        upload.flush()
+
+        retry = RetryPolicy(max_attempts=10) if args.throttle else None
+        api = BoxView('<box view api key>',
+                      base_url=server.api_url,
+                      upload_url=server.api_url,
+                      retry=retry,
+                      pool_maxsize=args.concurrency,
+                      transport=args.transport)
+
+        if not args.json:
+            print('{:<10} {:>10} {:>10} {:>10} {:>8} {:>10}'.format(
+                'scenario', 'req/s', 'p50 ms', 'p99 ms', 'errors',
+                'rss MB'))
+        for name, func in scenarios(api, upload.name):
+            if args.scenario and name not in args.scenario:
+                continue
+            result = run_scenario(func, args.requests, args.concurrency)
+            if args.json:
+                print(json.dumps(dict(result, scenario=name)))
+            else:
+                result = dict((key, '-' if value is None else value)
+                              for key, value in result.items())
+                print('{:<10} {rps:>10} {p50_ms:>10} {p99_ms:>10} '
+                      '{errors:>8} {peak_rss_mb:>10}'.format(name, **result))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,5 +4,17 @@ __version__ = '1.2.2'
 __author__ = 'Maxim Kamenkov'
 
 from .boxview import BoxView, BoxViewError, RetryAfter
+from .cache import FileCache, MetadataCache
+from .dedup import DedupIndex
+from .metrics import Instrument, MetricsCollector
+from .models import Document, DocumentPage, Session
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .sessionpool import SessionPool
+from .watcher import DocumentWatcher
+from .webhook import WebhookReceiver
 
-__all__ = ['BoxView', 'BoxViewError', 'RetryAfter']
+__all__ = ['BoxView', 'BoxViewError', 'RetryAfter', 'RateLimiter',
+           'RetryPolicy', 'DocumentWatcher', 'WebhookReceiver', 'FileCache',
+           'MetadataCache', 'DedupIndex', 'SessionPool', 'Instrument',
+           'MetricsCollector', 'Document', 'DocumentPage', 'Session']
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio flavour of :class:`boxview.boxview.BoxView` built on top of aiohttp.
+
+Python 3.5+ only; install with ``pip install python-boxview[async]``.
+"""
+
+import io
+import json
+from urllib.parse import urljoin
+
+import aiohttp
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from .boxview import (
+    BoxView, BoxViewError, RetryAfter, TokenAuth, DONE, API_URL, UPLOAD_URL,
+    DOWNLOAD_CHUNK_SIZE, _get_box_view_api_key, _document_data,
+    _document_content_url, _documents_params, _session_data,
+    _storage_profile_data
+)
+from .utils import default_headers, get_mimetype_from_headers
+
+__all__ = ['AsyncBoxView', 'asgi_webhook']
+
+
+def _to_response(response, content):
+    """
+    Wraps finished aiohttp response into `requests.Response`, so
+    `BoxViewError` and `RetryAfter` can be shared with sync client.
+    """
+    wrapped = Response()
+    wrapped.status_code = response.status
+    wrapped.reason = response.reason
+    wrapped.url = str(response.url)
+    wrapped.headers = CaseInsensitiveDict(response.headers)
+    wrapped._content = content
+    return wrapped
+
+
+class AsyncBoxView(object):
+
+    def __init__(self,
+                 api_key=None,
+                 headers=None,
+                 session=None,
+                 timeout=None,
+                 base_url=API_URL,
+                 upload_url=UPLOAD_URL,
+                 max_connections=100,
+                 chunk_size=DOWNLOAD_CHUNK_SIZE):
+        if not api_key:
+            api_key = _get_box_view_api_key()
+
+        self.token = TokenAuth(api_key)
+        self.timeout = timeout
+        self.base_url = base_url
+        self.upload_url = upload_url
+        self.max_connections = max_connections
+        self.chunk_size = chunk_size
+
+        if headers is None:
+            headers = default_headers()
+
+        self.token.populate_to_headers(headers)
+        self.headers = dict(headers)
+
+        self.session = session
+
+    def _get_session(self):
+        # `aiohttp.ClientSession` has to be created inside running loop
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def request(self, method, url, **kwargs):
+        url = urljoin(self.base_url, url)
+        stream = kwargs.pop('stream', False)
+
+        headers = dict(self.headers)
+        headers.update(kwargs.pop('headers', None) or {})
+
+        if self.timeout is not None:
+            kwargs.setdefault('timeout',
+                              aiohttp.ClientTimeout(total=self.timeout))
+
+        if method.upper() in ['GET', 'HEAD', 'OPTIONS']:
+            kwargs.setdefault('allow_redirects', True)
+
+        params = kwargs.get('params')
+        if params:
+            kwargs['params'] = dict((k, str(v)) for k, v in params.items())
+
+        session = self._get_session()
+        response = await session.request(method, url, headers=headers,
+                                         **kwargs)
+
+        if 'Retry-After' in response.headers or response.status >= 400:
+            content = await response.read()
+            response.release()
+            wrapped = _to_response(response, content)
+            if 'Retry-After' in wrapped.headers:
+                raise RetryAfter(wrapped)
+            raise BoxViewError(wrapped)
+
+        if not stream:
+            await response.read()
+
+        return response
+
+    async def _request_json(self, method, url, **kwargs):
+        response = await self.request(method, url, **kwargs)
+        return json.loads((await response.read()).decode('utf-8'))
+
+    async def create_document(self,
+                              url=None,
+                              file=None,
+                              name='',
+                              thumbnails='',
+                              non_svg=None):
+        if not url and not file:
+            raise ValueError("Document url or file is required")
+
+        data = _document_data(name, thumbnails, non_svg)
+        if url:
+            return await self.create_document_from_url(url, **data)
+        else:
+            return await self.create_document_from_file(file, **data)
+
+    async def create_document_from_file(self, file, **data):
+
+        async def _create_from_file(file):
+            url = urljoin(self.upload_url, 'documents')
+            form = aiohttp.FormData()
+            for key, value in data.items():
+                form.add_field(key, str(value))
+            form.add_field('file', file,
+                           filename=getattr(file, 'name', 'file'))
+            return await self._request_json('POST', url, data=form)
+
+        if hasattr(file, 'read'):
+            return await _create_from_file(file)
+        else:
+            with open(file, 'rb') as file:
+                return await _create_from_file(file)
+
+    async def create_document_from_url(self, url, **data):
+        data['url'] = url
+        headers = {'Content-Type': 'application/json'}
+        return await self._request_json('POST',
+                                        'documents',
+                                        data=json.dumps(data),
+                                        headers=headers)
+
+    async def get_document(self, document_id, fields=None):
+        url = 'documents/{}'.format(document_id)
+        if fields:
+            params = {'fields': fields}
+        else:
+            params = None
+        return await self._request_json('GET', url, params=params)
+
+    async def delete_document(self, document_id):
+        url = 'documents/{}'.format(document_id)
+        await self.request('DELETE', url)
+
+    async def update_document(self, document_id, name):
+        url = 'documents/{}'.format(document_id)
+        data = {'name': name}
+        headers = {'Content-Type': 'application/json'}
+        return await self._request_json('PUT',
+                                        url,
+                                        data=json.dumps(data),
+                                        headers=headers)
+
+    async def get_documents(self,
+                            limit=None,
+                            created_before=None,
+                            created_after=None):
+        params = _documents_params(limit, created_before, created_after)
+        return await self._request_json('GET', 'documents', params=params)
+
+    async def _download(self, stream, url, **kwargs):
+        response = await self.request('GET', url, stream=True, **kwargs)
+        try:
+            async for chunk in response.content.iter_chunked(
+                    self.chunk_size):
+                stream.write(chunk)
+        finally:
+            response.release()
+        return get_mimetype_from_headers(response.headers)
+
+    async def get_thumbnail(self, stream, document_id, width, height):
+        url = 'documents/{}/thumbnail'.format(document_id)
+        params = {
+            'width': width,
+            'height': height,
+        }
+        return await self._download(stream, url, params=params)
+
+    async def get_thumbnail_to_file(self,
+                                    filename,
+                                    document_id,
+                                    width,
+                                    height):
+        with open(filename, 'wb') as fp:
+            return await self.get_thumbnail(fp, document_id, width, height)
+
+    async def get_thumbnail_to_string(self, document_id, width, height):
+        fp = io.BytesIO()
+        mimetype = await self.get_thumbnail(fp, document_id, width, height)
+        return fp.getvalue(), mimetype
+
+    async def get_document_content(self,
+                                   stream,
+                                   document_id,
+                                   extension=None):
+        url = _document_content_url(document_id, extension)
+        return await self._download(stream, url)
+
+    async def get_document_content_to_file(self,
+                                           filename,
+                                           document_id,
+                                           extension=None):
+        with open(filename, 'wb') as fp:
+            return await self.get_document_content(fp,
+                                                   document_id,
+                                                   extension)
+
+    async def get_document_content_to_string(self,
+                                             document_id,
+                                             extension=None):
+        fp = io.BytesIO()
+        mimetype = await self.get_document_content(fp,
+                                                   document_id,
+                                                   extension)
+        return fp.getvalue(), mimetype
+
+    async def get_document_content_mimetype(self, document_id):
+        url = 'documents/{}/content'.format(document_id)
+        response = await self.request('HEAD', url)
+        return get_mimetype_from_headers(response.headers)
+
+    async def create_session(self,
+                             document_id,
+                             duration=None,
+                             expires_at=None,
+                             is_downloadable=None,
+                             is_text_selectable=None):
+        data = _session_data(document_id,
+                             duration,
+                             expires_at,
+                             is_downloadable,
+                             is_text_selectable)
+        headers = {'Content-Type': 'application/json'}
+        return await self._request_json('POST',
+                                        'sessions',
+                                        data=json.dumps(data),
+                                        headers=headers)
+
+    async def delete_session(self, session_id):
+        url = 'sessions/{}'.format(session_id)
+        await self.request('DELETE', url)
+
+    async def ready_to_view(self, document_id):
+        document = await self.get_document(document_id)
+        if document['status'] == DONE:
+            return document
+
+    async def get_document_status(self, document_id):
+        document = await self.get_document(document_id)
+        return document['status']
+
+    get_session_url = staticmethod(BoxView.get_session_url)
+    get_realtime_url = staticmethod(BoxView.get_realtime_url)
+
+    async def create_storage_profile(self,
+                                     provider,
+                                     s3_bucket_name,
+                                     s3_access_key_id,
+                                     s3_secret_access_key):
+        data = _storage_profile_data(provider,
+                                     s3_bucket_name,
+                                     s3_access_key_id,
+                                     s3_secret_access_key)
+        headers = {'Content-Type': 'application/json'}
+        return await self._request_json('POST',
+                                        'settings/storage-profile',
+                                        data=json.dumps(data),
+                                        headers=headers)
+
+    async def get_storage_profile(self):
+        return await self._request_json('GET', 'settings/storage-profile')
+
+    async def delete_storage_profile(self):
+        await self.request('DELETE', 'settings/storage-profile')
+
+    async def create_webhook(self, url):
+        data = {'url': url}
+        headers = {'Content-Type': 'application/json'}
+        return await self._request_json('POST',
+                                        'settings/webhook',
+                                        data=json.dumps(data),
+                                        headers=headers)
+
+    async def get_webhook(self):
+        return await self._request_json('GET', 'settings/webhook')
+
+    async def delete_webhook(self):
+        await self.request('DELETE', 'settings/webhook')
+
+
+def asgi_webhook(receiver):
+    """
+    Wraps `boxview.webhook.WebhookReceiver` into ASGI application.
+    """
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+
+        body, more_body = b'', True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+        status, content = receiver.handle(scope['method'], body)
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split()[0]),
+            'headers': [
+                (b'content-type', b'text/plain'),
+                (b'content-length', str(len(content)).encode('ascii')),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    return app
@@ -3,19 +3,35 @@
 import os
 import six
 import json
+import time
+import datetime
+import warnings
 if six.PY3:
     from urllib.parse import urljoin
 else:
     from urlparse import urljoin
 
 from .utils import (
-    default_session, default_headers, format_date, add_to_url,
-    get_mimetype_from_headers, format_error_response
+    default_session, default_headers, format_date, parse_date, add_to_url,
+    get_mimetype_from_headers, format_error_response, iter_concurrent,
+    copy_response, Tee, SessionProvider, DEFAULT_POOLSIZE
+)
+from .ratelimit import RateLimiter, monotonic
+from .retry import RetryPolicy
+from .sse import iter_events
+from .metrics import RequestInfo, endpoint_template
+from .transport import Transport, RequestsTransport, Urllib3Transport
+from .models import (
+    Document, DocumentPage, Session, QUEUED, PROCESSING, DONE, ERROR
 )
 
 __all__ = ['BoxView', 'BoxViewError', 'RetryAfter']
 
-DOWNLOAD_CHUNK_SIZE = 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_MAX_WORKERS = 8
+
+MAX_PAGE_SIZE = 50
 
 API_VERSION = '1'
 BASE_API_URL = 'https://view-api.box.com/'
@@ -24,11 +40,12 @@ BASE_UPLOAD_URL = 'https://upload.view-api.box.com/'
 API_URL = '{}{}/'.format(BASE_API_URL, API_VERSION)
 UPLOAD_URL = '{}{}/'.format(BASE_UPLOAD_URL, API_VERSION)
 
-QUEUED, PROCESSING, DONE, ERROR = ('queued', 'processing', 'done', 'error')
-
 
 class BoxViewError(Exception):
 
+    attempts = 1
+    retry_time = 0.0
+
     def __init__(self, response=None, message=''):
         Exception.__init__(self)
         if not message and response is not None:
@@ -69,6 +86,108 @@ class TokenAuth(object):
         return self.token
 
 
+def _is_seekable(file):
+    seekable = getattr(file, 'seekable', None)
+    if seekable is not None:
+        return seekable()
+    return hasattr(file, 'seek')
+
+
+def _document_data(name='', thumbnails='', non_svg=None):
+    data = {}
+    if name:
+        data['name'] = name
+    if thumbnails:
+        data['thumbnails'] = thumbnails
+    if non_svg is not None:
+        data['non_svg'] = bool(non_svg)
+    return data
+
+
+def _document_content_url(document_id, extension=None):
+    url = 'documents/{}/content'.format(document_id)
+
+    allowed_extensions = ['.pdf', '.zip', '.txt']
+    if extension:
+        if extension in allowed_extensions:
+            url = '{0}{1}'.format(url, extension)
+        else:
+            raise ValueError(
+                "Invalid extension '{0}'; choose one of {1}".format(
+                    extension, ', '.join(allowed_extensions)))
+    return url
+
+
+def _documents_params(limit=None, created_before=None, created_after=None):
+    params = {}
+    if limit:
+        params['limit'] = limit
+    if created_after:
+        params['created_after'] = format_date(created_after)
+    if created_before:
+        params['created_before'] = format_date(created_before)
+    return params
+
+
+def _session_data(document_id,
+                  duration=None,
+                  expires_at=None,
+                  is_downloadable=None,
+                  is_text_selectable=None):
+    data = {'document_id': document_id}
+    if duration:
+        data['duration'] = duration
+    if expires_at:
+        data['expires_at'] = format_date(expires_at)
+    if is_downloadable is not None:
+        data['is_downloadable'] = bool(is_downloadable)
+    if is_text_selectable is not None:
+        data['is_text_selectable'] = bool(is_text_selectable)
+    return data
+
+
+def _storage_profile_data(provider,
+                          s3_bucket_name,
+                          s3_access_key_id,
+                          s3_secret_access_key):
+    allowed_providers = ['S3']
+    if provider not in allowed_providers:
+        raise ValueError(
+            "Invalid provider '{0}'; choose one of {1}".format(
+                provider, ', '.join(allowed_providers)))
+
+    return {
+        'provider': provider,
+        's3_bucket_name': s3_bucket_name,
+        's3_access_key_id': s3_access_key_id,
+        's3_secret_access_key': s3_secret_access_key,
+    }
+
+
+def _body_size(data, files=None):
+    if files is not None or isinstance(data, dict):
+        return None  # form encoded by requests, size is unknown here
+    if data is None:
+        return 0
+    try:
+        return len(data)
+    except TypeError:
+        return None  # e.g. generator
+
+
+def _content_size(response):
+    if response._content_consumed and response._content is not None:
+        return len(response._content or b'')
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def _session_headers(headers):
+    from requests.structures import CaseInsensitiveDict
+
+    return CaseInsensitiveDict(headers)
+
+
 class BoxView(object):
 
     def __init__(self,
@@ -76,27 +195,132 @@ class BoxView(object):
                  headers=None,
                  session=None,
                  timeout=None,
-                 base_url=API_URL):
+                 base_url=API_URL,
+                 upload_url=UPLOAD_URL,
+                 rate_limit=None,
+                 retry=None,
+                 chunk_size=DOWNLOAD_CHUNK_SIZE,
+                 cache=None,
+                 metadata_cache=None,
+                 dedup=None,
+                 pool_connections=DEFAULT_POOLSIZE,
+                 pool_maxsize=DEFAULT_POOLSIZE,
+                 pool_block=False,
+                 pool_hosts=None,
+                 per_thread_session=False,
+                 instruments=None,
+                 transport=None,
+                 json_loads=None,
+                 models=False):
         if not api_key:
             api_key = _get_box_view_api_key()
 
         self.token = TokenAuth(api_key)
         self.timeout = timeout
         self.base_url = base_url
-
-        if session is None:
-            session = default_session()
+        self.upload_url = upload_url
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self.metadata_cache = metadata_cache
+        self.dedup = dedup
+        self.instruments = list(instruments or ())
+        self.json_loads = json_loads
+        self.models = models
+
+        if rate_limit is not None and not isinstance(rate_limit, RateLimiter):
+            rate_limit = RateLimiter(rate_limit)
+        self.rate_limiter = rate_limit
+
+        if retry is not None and not isinstance(retry, RetryPolicy):
+            retry = RetryPolicy(max_attempts=retry)
+        self.retry = retry
 
         if headers is None:
             headers = default_headers()
-
         self.token.populate_to_headers(headers)
-        session.headers = headers
 
-        self.session = session
+        if session is not None and not callable(session):
+            session.headers = _session_headers(headers)
+            self.sessions = SessionProvider(session=session)
+        else:
+            # `session` may be factory, e.g. `requests.Session`
+            factory = session
+
+            def _create_session():
+                if factory is None:
+                    session = default_session(
+                        pool_connections=pool_connections,
+                        pool_maxsize=pool_maxsize,
+                        pool_block=pool_block,
+                        hosts=pool_hosts)
+                else:
+                    session = factory()
+                session.headers = _session_headers(headers)
+                return session
+            self.sessions = SessionProvider(_create_session,
+                                            per_thread=per_thread_session)
+
+        if transport is None or transport == 'requests':
+            transport = RequestsTransport(self.sessions)
+        elif transport == 'urllib3':
+            transport = Urllib3Transport(headers,
+                                         pool_connections=pool_connections,
+                                         pool_maxsize=pool_maxsize,
+                                         pool_block=pool_block)
+        elif not isinstance(transport, Transport):
+            raise ValueError("Invalid transport '{}'; choose one of "
+                             "requests, urllib3".format(transport))
+        self.transport = transport
+
+    @property
+    def session(self):
+        """ Session of the current process (and thread, if per thread). """
+        return self.sessions.get()
+
+    @session.setter
+    def session(self, session):
+        self.sessions = SessionProvider(session=session)
+        if isinstance(self.transport, RequestsTransport):
+            self.transport.sessions = self.sessions
 
     def request(self, method, url, **kwargs):
-        url = urljoin(self.base_url, url)
+        if not self.instruments:
+            return self._request(method, url, **kwargs)
+
+        size = _body_size(kwargs.get('data'), kwargs.get('files'))
+        info = RequestInfo(method.upper(), url, endpoint_template(url),
+                           monotonic(), size)
+        for instrument in self.instruments:
+            instrument.before(info)
+
+        try:
+            response = self._request(method, url, **kwargs)
+        except Exception as e:
+            info.elapsed = monotonic() - info.started
+            info.error = e
+            info.attempts = getattr(e, 'attempts', 1)
+            response = getattr(e, 'response', None)
+            if response is not None:
+                info.status = response.status_code
+                info.ttfb = response.elapsed.total_seconds()
+            for instrument in self.instruments:
+                instrument.error(info)
+            raise
+
+        info.elapsed = monotonic() - info.started
+        info.status = response.status_code
+        info.ttfb = response.elapsed.total_seconds()
+        info.attempts = response.attempts
+        info.bytes_received = _content_size(response)
+        for instrument in self.instruments:
+            instrument.after(info)
+        return response
+
+    def _request(self, method, url, **kwargs):
+        if '://' in url or url.startswith('/') or self.base_url[-1:] != '/':
+            url = urljoin(self.base_url, url)
+        else:
+            url = self.base_url + url  # relative path, the common case
 
         if self.timeout is not None:
             kwargs.setdefault('timeout', self.timeout)
@@ -104,16 +328,66 @@ class BoxView(object):
         if method.upper() in ['GET', 'HEAD', 'OPTIONS']:
             kwargs.setdefault('allow_redirects', True)
 
-        response = self.session.request(method, url, **kwargs)
+        retry = self.retry
+        started = retry.clock() if retry is not None else None
+        attempts, retry_time = 1, 0.0
+        while True:
+            try:
+                response = self._send(method, url, **kwargs)
+            except BoxViewError as e:
+                delay = None
+                if retry is not None:
+                    elapsed = retry.clock() - started
+                    delay = retry.get_delay(e, attempts, elapsed, method)
+                if delay is None:
+                    e.attempts, e.retry_time = attempts, retry_time
+                    raise
+                e.response.close()
+                body = kwargs.get('data')
+                if hasattr(body, 'seek'):
+                    body.seek(0)  # streamed upload has to be sent again
+                retry.sleep(delay)
+                attempts += 1
+                retry_time += delay
+            else:
+                response.attempts, response.retry_time = attempts, retry_time
+                return response
+
+    def _send(self, method, url, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        response = self.transport.send(method, url, **kwargs)
 
         if 'Retry-After' in response.headers:
-            raise RetryAfter(response)
+            error = RetryAfter(response)
+            # 202 with `Retry-After` means "not ready yet", not throttling
+            if self.rate_limiter is not None and response.status_code == 429:
+                self.rate_limiter.pause(error.seconds)
+            raise error
 
         if not response.ok:
             raise BoxViewError(response)
 
         return response
 
+    def pool_stats(self):
+        """ See `boxview.utils.pool_stats`. """
+        return self.transport.pool_stats()
+
+    def _json(self, response, model=None):
+        """
+        Decodes response body with `json_loads` (e.g. `ujson.loads`), if
+        given, and wraps it into `model` when `models` are enabled.
+        """
+        if self.json_loads is not None:
+            data = self.json_loads(response.content)
+        else:
+            data = response.json()
+        if model is not None and self.models:
+            return model(data)
+        return data
+
     def create_document(self,
                         url=None,
                         file=None,
@@ -123,35 +397,70 @@ class BoxView(object):
         if not url and not file:
             raise ValueError("Document url or file is required")
 
-        data = {}
-        if name:
-            data['name'] = name
-        if thumbnails:
-            data['thumbnails'] = thumbnails
-        if non_svg is not None:
-            data['non_svg'] = bool(non_svg)
-
+        data = _document_data(name, thumbnails, non_svg)
         if url:
             return self.create_document_from_url(url, **data)
         else:
             return self.create_document_from_file(file, **data)
 
-    def create_document_from_file(self, file, **data):
-
-        def _create_from_file(file):
-            url = urljoin(UPLOAD_URL, 'documents')
+    def create_document_from_file(self, file, progress=None, **data):
+        """
+        Uploads file (path or file object) without reading it into memory.
+        `progress(sent, total)` is called as the upload goes. With `dedup`
+        index, document previously created from the same content is
+        returned instead, while it still exists.
+        """
+        digest = None
+        if self.dedup is not None and (not hasattr(file, 'read') or
+                                       _is_seekable(file)):
+            from .dedup import hash_file
+
+            digest = hash_file(file)
+            document = self._get_deduplicated(digest)
+            if document is not None:
+                return document
+
+        document = self._upload_file(file, progress, data)
+        if digest is not None:
+            self.dedup.add(digest, document['id'])
+        return document
+
+    def _get_deduplicated(self, digest):
+        document_id = self.dedup.get(digest)
+        if document_id is None:
+            return None
+        try:
+            document = self.get_document(document_id)
+        except BoxViewError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+            document = None
+        if document is None or document['status'] == ERROR:
+            self.dedup.remove(digest)
+            return None
+        return document
+
+    def _upload_file(self, file, progress, data):
+        from .multipart import MultipartEncoder
+
+        url = urljoin(self.upload_url, 'documents')
+
+        if hasattr(file, 'read') and not _is_seekable(file):
+            # size of the stream is unknown, let requests encode it
             files = {'file': file}
             response = self.request('POST',
                                     url,
                                     data=data,
                                     files=files)
-            return response.json()
+            return self._json(response, Document)
 
-        if hasattr(file, 'read'):
-            return _create_from_file(file)
-        else:
-            with open(file, 'rb') as file:
-                return _create_from_file(file)
+        with MultipartEncoder(data, file, callback=progress) as body:
+            headers = {'Content-Type': body.content_type}
+            response = self.request('POST',
+                                    url,
+                                    data=body,
+                                    headers=headers)
+        return self._json(response, Document)
 
     def create_document_from_url(self, url, **data):
         data['url'] = url
@@ -160,7 +469,28 @@ class BoxView(object):
                                 'documents',
                                 data=json.dumps(data),
                                 headers=headers)
-        return response.json()
+        return self._json(response, Document)
+
+    def create_documents(self,
+                         items,
+                         max_workers=DEFAULT_MAX_WORKERS,
+                         thumbnails='',
+                         non_svg=None):
+        """
+        Uploads many documents concurrently. Items are file paths, file
+        objects or urls. Yields `(item, document)` pairs as uploads complete;
+        failed upload yields exception in place of document.
+        """
+        data = _document_data(thumbnails=thumbnails, non_svg=non_svg)
+
+        def _create(item):
+            if hasattr(item, 'read'):
+                return self.create_document_from_file(item, **data)
+            if item.startswith(('http://', 'https://')):
+                return self.create_document_from_url(item, **data)
+            return self.create_document_from_file(item, **data)
+
+        return iter_concurrent(_create, items, max_workers)
 
     def get_document(self, document_id, fields=None):
         url = 'documents/{}'.format(document_id)
@@ -168,11 +498,23 @@ class BoxView(object):
             params = {'fields': fields}
         else:
             params = None
-        return self.request('GET', url, params=params).json()
+
+        def _get_document():
+            return self._json(self.request('GET', url, params=params),
+                              Document)
+
+        if self.metadata_cache is not None and not fields:
+            return self.metadata_cache.get_or_fetch(document_id,
+                                                    _get_document)
+        return _get_document()
 
     def delete_document(self, document_id):
         url = 'documents/{}'.format(document_id)
         self.request('DELETE', url)
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate(document_id)
+        if self.dedup is not None:
+            self.dedup.remove_document(document_id)
 
     def update_document(self, document_id, name):
         url = 'documents/{}'.format(document_id)
@@ -182,73 +524,267 @@ class BoxView(object):
                                 url,
                                 data=json.dumps(data),
                                 headers=headers)
-        return response.json()
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate(document_id)
+        return self._json(response, Document)
 
     def get_documents(self,
                       limit=None,
                       created_before=None,
                       created_after=None):
-        params = {}
-        if limit:
-            params['limit'] = limit
-        if created_after:
-            params['created_after'] = format_date(created_after)
-        if created_before:
-            params['created_before'] = format_date(created_before)
-
-        return self.request('GET', 'documents', params=params).json()
-
-    def get_thumbnail(self, stream, document_id, width, height):
+        params = _documents_params(limit, created_before, created_after)
+        response = self.request('GET', 'documents', params=params)
+        return self._json(response, DocumentPage)
+
+    def iter_documents(self,
+                       page_size=MAX_PAGE_SIZE,
+                       created_before=None,
+                       created_after=None,
+                       prefetch=True,
+                       on_skip=None):
+        """
+        Yields documents (newest first), paging by moving `created_before`
+        to the end of the second the last seen document was created at
+        (documents seen already are dropped, so it doesn't matter whether
+        API compares `created_before` inclusively). Next page is fetched in
+        background while current one is consumed, so at most two pages are
+        kept in memory.
+
+        API filters by whole seconds, so when more than `MAX_PAGE_SIZE`
+        documents are created at the same second, only `MAX_PAGE_SIZE` of
+        them can be listed and the rest are skipped: `RuntimeWarning` is
+        issued and `on_skip(created_at)` is called for every such second.
+        """
+        from concurrent.futures import Future, ThreadPoolExecutor
+
+        def _fetch(created_before, limit):
+            page = self.get_documents(limit, created_before, created_after)
+            return limit, page['document_collection']['entries']
+
+        def _submit(created_before, limit=page_size):
+            if executor is not None:
+                return executor.submit(_fetch, created_before, limit)
+            future = Future()
+            future.set_result(_fetch(created_before, limit))
+            return future
+
+        executor = ThreadPoolExecutor(1) if prefetch else None
+        future = None
+        try:
+            # everything created after `floor` second is yielded already,
+            # as are `boundary_ids` created at it
+            floor, boundary_ids = None, set()
+            shift = datetime.timedelta(seconds=1)
+            future = _submit(created_before)
+            while future is not None:
+                limit, entries = future.result()
+                future = None
+                new_entries, relisted = [], False
+                for entry in entries:
+                    created = parse_date(entry['created_at'])
+                    if floor is None or created < floor or (
+                            created == floor and
+                            entry['id'] not in boundary_ids):
+                        new_entries.append((created, entry))
+                    elif created > floor:
+                        # API compares `created_before` inclusively
+                        shift, relisted = datetime.timedelta(0), True
+
+                if entries and len(entries) >= limit:
+                    if new_entries:
+                        last_created = new_entries[-1][0]
+                        if last_created != floor:
+                            floor, boundary_ids = last_created, set()
+                        boundary_ids.update(e['id'] for c, e in new_entries
+                                            if c == floor)
+                        future = _submit(floor + shift)
+                    elif limit < MAX_PAGE_SIZE:
+                        # page is filled with already seen documents
+                        # created at the same second, ask for bigger one
+                        future = _submit(floor + shift,
+                                         min(limit + page_size,
+                                             MAX_PAGE_SIZE))
+                    elif relisted:
+                        future = _submit(floor + shift)
+                    else:
+                        # too many documents created at the same second,
+                        # the rest of them can't be listed
+                        skipped_at = floor.isoformat() + 'Z'
+                        warnings.warn(
+                            "More than {} documents created at {}, some of "
+                            "them are skipped".format(MAX_PAGE_SIZE,
+                                                      skipped_at),
+                            RuntimeWarning)
+                        if on_skip is not None:
+                            on_skip(skipped_at)
+                        floor -= datetime.timedelta(seconds=1)
+                        boundary_ids = set()
+                        future = _submit(floor + shift)
+
+                for created, entry in new_entries:
+                    yield entry
+        finally:
+            if future is not None:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def purge_documents(self,
+                        created_before,
+                        max_workers=DEFAULT_MAX_WORKERS,
+                        dry_run=False,
+                        checkpoint=None,
+                        progress=None):
+        """
+        Deletes all documents created before `created_before` concurrently
+        and returns `boxview.purge.PurgeReport`. With `dry_run=True`
+        documents are only counted. See `boxview.purge.purge_documents`.
+        """
+        from .purge import purge_documents
+
+        return purge_documents(self, created_before, max_workers,
+                               dry_run=dry_run,
+                               checkpoint=checkpoint,
+                               progress=progress)
+
+    def _download(self,
+                  stream,
+                  url,
+                  chunk_size=None,
+                  cache_key=None,
+                  **kwargs):
+        cache = self.cache if cache_key is not None else None
+        if cache is not None:
+            entry = cache.get(cache_key)
+            if entry is not None:
+                with entry:
+                    entry.write_to(stream)
+                return entry.mimetype
+
+        response = self.request('GET', url, stream=True, **kwargs)
+        mimetype = get_mimetype_from_headers(response.headers)
+        writer = None
+        try:
+            if cache is not None:
+                writer = cache.writer(cache_key, mimetype)
+                stream = Tee(stream, writer)
+            copy_response(response, stream, chunk_size or self.chunk_size)
+        except Exception:
+            response.close()
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            writer.commit()
+        return mimetype
+
+    def get_thumbnail(self,
+                      stream,
+                      document_id,
+                      width,
+                      height,
+                      chunk_size=None):
         url = 'documents/{}/thumbnail'.format(document_id)
         params = {
             'width': width,
             'height': height,
         }
-        response = self.request('GET', url, params=params)
-
-        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
-            stream.write(chunk)
-
-        return get_mimetype_from_headers(response.headers)
-
-    def get_thumbnail_to_file(self, filename, document_id, width, height):
+        cache_key = (document_id, 'thumbnail', '{}x{}'.format(width, height))
+        return self._download(stream, url, chunk_size, cache_key,
+                              params=params)
+
+    def get_thumbnail_to_file(self,
+                              filename,
+                              document_id,
+                              width,
+                              height,
+                              chunk_size=None):
         with open(filename, 'wb') as fp:
-            return self.get_thumbnail(fp, document_id, width, height)
-
-    def get_thumbnail_to_string(self, document_id, width, height):
+            return self.get_thumbnail(fp, document_id, width, height,
+                                      chunk_size)
+
+    def get_thumbnail_to_string(self,
+                                document_id,
+                                width,
+                                height,
+                                chunk_size=None):
         fp = six.BytesIO()
-        mimetype = self.get_thumbnail(fp, document_id, width, height)
+        mimetype = self.get_thumbnail(fp, document_id, width, height,
+                                      chunk_size)
         return fp.getvalue(), mimetype
 
-    def get_document_content(self, stream, document_id, extension=None):
-        url = 'documents/{}/content'.format(document_id)
-
-        allowed_extensions = ['.pdf', '.zip', '.txt']
-        if extension:
-            if extension in allowed_extensions:
-                url = '{0}{1}'.format(url, extension)
+    def get_thumbnails(self,
+                       items,
+                       max_workers=DEFAULT_MAX_WORKERS,
+                       not_ready_retries=3):
+        """
+        Fetches many thumbnails concurrently. Items are
+        `(document_id, width, height)` tuples; `(item, content, mimetype)`
+        is yielded as each thumbnail completes, or `(item, exception, None)`
+        on failure. Thumbnail which is not ready yet (202) is requested
+        again after `Retry-After` up to `not_ready_retries` times.
+        """
+        def _fetch(item):
+            document_id, width, height = item
+            retries = 0
+            while True:
+                try:
+                    return self.get_thumbnail_to_string(document_id,
+                                                        width,
+                                                        height)
+                except RetryAfter as e:
+                    if (e.response.status_code != 202 or
+                            retries >= not_ready_retries):
+                        raise
+                    retries += 1
+                    time.sleep(e.seconds)
+
+        for item, result in iter_concurrent(_fetch, items, max_workers):
+            if isinstance(result, Exception):
+                yield item, result, None
             else:
-                raise ValueError(
-                    "Invalid extension '{0}'; choose one of {1}".format(
-                        extension, ', '.join(allowed_extensions)))
-
-        response = self.request('GET', url, stream=True)
+                yield (item,) + result
 
-        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
-            stream.write(chunk)
-
-        return get_mimetype_from_headers(response.headers)
+    def get_document_content(self,
+                             stream,
+                             document_id,
+                             extension=None,
+                             chunk_size=None):
+        url = _document_content_url(document_id, extension)
+        cache_key = (document_id, 'content', extension or '')
+        return self._download(stream, url, chunk_size, cache_key)
 
     def get_document_content_to_file(self,
                                      filename,
                                      document_id,
-                                     extension=None):
+                                     extension=None,
+                                     chunk_size=None,
+                                     resume=False,
+                                     parts=1):
+        """
+        With `resume=True` download interrupted by previous call continues
+        from where it stopped. With `parts > 1` content is fetched by
+        `parts` concurrent range requests.
+        """
+        from .download import download_resumable, download_parts
+
+        url = _document_content_url(document_id, extension)
+        chunk_size = chunk_size or self.chunk_size
+        if parts > 1:
+            return download_parts(self, filename, url, parts, chunk_size)
+        if resume:
+            return download_resumable(self, filename, url, chunk_size)
         with open(filename, 'wb') as fp:
-            return self.get_document_content(fp, document_id, extension)
+            return self.get_document_content(fp, document_id, extension,
+                                             chunk_size)
 
-    def get_document_content_to_string(self, document_id, extension=None):
+    def get_document_content_to_string(self,
+                                       document_id,
+                                       extension=None,
+                                       chunk_size=None):
         fp = six.BytesIO()
-        mimetype = self.get_document_content(fp, document_id, extension)
+        mimetype = self.get_document_content(fp, document_id, extension,
+                                             chunk_size)
         return fp.getvalue(), mimetype
 
     def get_document_content_mimetype(self, document_id):
@@ -262,22 +798,18 @@ class BoxView(object):
                        expires_at=None,
                        is_downloadable=None,
                        is_text_selectable=None):
-        data = {'document_id': document_id}
-        if duration:
-            data['duration'] = duration
-        if expires_at:
-            data['expires_at'] = format_date(expires_at)
-        if is_downloadable is not None:
-            data['is_downloadable'] = bool(is_downloadable)
-        if is_text_selectable is not None:
-            data['is_text_selectable'] = bool(is_text_selectable)
+        data = _session_data(document_id,
+                             duration,
+                             expires_at,
+                             is_downloadable,
+                             is_text_selectable)
         headers = {'Content-Type': 'application/json'}
 
         response = self.request('POST',
                                 'sessions',
                                 data=json.dumps(data),
                                 headers=headers)
-        return response.json()
+        return self._json(response, Session)
 
     def delete_session(self, session_id):
         url = 'sessions/{}'.format(session_id)
@@ -304,32 +836,40 @@ class BoxView(object):
         url = 'sse/{}'.format(session_id)
         return urljoin(BASE_API_URL, url)
 
+    def get_realtime_events(self,
+                            session_id,
+                            last_event_id=None,
+                            reconnect=True,
+                            max_reconnects=5):
+        """
+        Yields `boxview.sse.Event`s from session's realtime stream as pages
+        become available, till `finished` event.
+        """
+        url = self.get_realtime_url(session_id)
+        return iter_events(self, url,
+                           last_event_id=last_event_id,
+                           reconnect=reconnect,
+                           max_reconnects=max_reconnects)
+
     def create_storage_profile(self,
                                provider,
                                s3_bucket_name,
                                s3_access_key_id,
                                s3_secret_access_key):
-        allowed_providers = ['S3']
-        if provider not in allowed_providers:
-            raise ValueError(
-                "Invalid provider '{0}'; choose one of {1}".format(
-                    provider, ', '.join(allowed_providers)))
-
-        data = {
-            'provider': provider,
-            's3_bucket_name': s3_bucket_name,
-            's3_access_key_id': s3_access_key_id,
-            's3_secret_access_key': s3_secret_access_key,
-        }
+        data = _storage_profile_data(provider,
+                                     s3_bucket_name,
+                                     s3_access_key_id,
+                                     s3_secret_access_key)
         headers = {'Content-Type': 'application/json'}
         response = self.request('POST',
                                 'settings/storage-profile',
                                 data=json.dumps(data),
                                 headers=headers)
-        return response.json()
+        return self._json(response)
 
     def get_storage_profile(self):
-        return self.request('GET', 'settings/storage-profile').json()
+        response = self.request('GET', 'settings/storage-profile')
+        return self._json(response)
 
     def delete_storage_profile(self):
         self.request('DELETE', 'settings/storage-profile')
@@ -341,10 +881,10 @@ class BoxView(object):
                                 'settings/webhook',
                                 data=json.dumps(data),
                                 headers=headers)
-        return response.json()
+        return self._json(response)
 
     def get_webhook(self):
-        return self.request('GET', 'settings/webhook').json()
+        return self._json(self.request('GET', 'settings/webhook'))
 
     def delete_webhook(self):
         self.request('DELETE', 'settings/webhook')
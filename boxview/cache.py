@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+
+import os
+import six
+import mmap
+import errno
+import tempfile
+import threading
+import collections
+
+from .boxview import QUEUED, PROCESSING, DONE, ERROR
+from .ratelimit import monotonic
+
+__all__ = ['FileCache', 'MetadataCache']
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+# other processes sharing the directory grow it behind our back
+DEFAULT_RESCAN_INTERVAL = 60.0
+
+# share of `max_size` left after eviction, so it isn't needed on every write
+EVICT_TARGET = 0.8
+
+DEFAULT_MAX_ENTRIES = 10000
+
+# documents can't change after conversion, so only their names can be stale
+DEFAULT_TTLS = {
+    QUEUED: 2.0,
+    PROCESSING: 2.0,
+    DONE: 3600.0,
+    ERROR: 3600.0,
+}
+
+replace = getattr(os, 'replace', os.rename)
+
+
+class CacheEntry(object):
+    """ Cached content mapped to memory; must be closed after use. """
+
+    def __init__(self, mimetype, mapping, offset):
+        self.mimetype = mimetype
+        self.mapping = mapping
+        self.offset = offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_to(self, stream):
+        if six.PY3:
+            view = memoryview(self.mapping)
+            try:
+                stream.write(view[self.offset:])
+            finally:
+                view.release()
+        else:
+            stream.write(self.mapping[self.offset:])
+
+    def close(self):
+        self.mapping.close()
+
+
+class CacheWriter(object):
+    """
+    Collects content to temporary file next to cache entry; `commit()`
+    renames it into place, so readers never see partially written entry.
+    """
+
+    def __init__(self, cache, path, mimetype):
+        self.cache = cache
+        self.path = path
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                             prefix='.tmp-')
+        self.fp = os.fdopen(fd, 'wb')
+        self.fp.write((mimetype or '').encode('ascii') + b'\n')
+
+    def write(self, data):
+        self.fp.write(data)
+
+    def commit(self):
+        self.fp.close()
+        size = os.path.getsize(self.tmp_path)
+        replace(self.tmp_path, self.path)
+        self.cache._added(size)
+
+    def abort(self):
+        self.fp.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+class FileCache(object):
+    """
+    On-disk cache for converted document content and thumbnails, which
+    never change once document is done. Entries are keyed by tuple (e.g.
+    `(document_id, 'thumbnail', '100x100')`), read back with mmap and
+    evicted least recently used first when total size exceeds `max_size`.
+    Directory can be shared by many processes.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE,
+                 rescan_interval=DEFAULT_RESCAN_INTERVAL, clock=monotonic):
+        self.directory = directory
+        self.max_size = max_size
+        self.rescan_interval = rescan_interval
+        self.clock = clock
+        self.size = None
+        self.scanned = None
+        self.lock = threading.Lock()
+
+    def _path(self, key):
+        import hashlib
+
+        name = hashlib.sha1('/'.join(map(str, key)).encode('utf-8'))
+        name = name.hexdigest()
+        return os.path.join(self.directory, name[:2], name)
+
+    def get(self, key):
+        """ Returns `CacheEntry` for `key` or `None` on miss. """
+        path = self._path(key)
+        try:
+            fp = open(path, 'rb')
+        except (IOError, OSError):
+            return None
+
+        with fp:
+            mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = mapping.find(b'\n') + 1
+        mimetype = mapping[:offset - 1].decode('ascii') or None
+        try:
+            os.utime(path, None)  # mark as recently used
+        except OSError:
+            pass
+        return CacheEntry(mimetype, mapping, offset)
+
+    def writer(self, key, mimetype):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        return CacheWriter(self, path, mimetype)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _entries(self):
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _added(self, size):
+        with self.lock:
+            now = self.clock()
+            if (self.size is None or
+                    now - self.scanned >= self.rescan_interval):
+                self.size = sum(e[1] for e in self._entries())
+                self.scanned = now
+            else:
+                self.size += size
+            if self.size > self.max_size:
+                self._evict(self.max_size)  # re-scans before evicting
+
+    def evict(self):
+        """ Removes least recently used entries to 80% of `max_size`. """
+        with self.lock:
+            self._evict()
+
+    def _evict(self, limit=0):
+        entries = sorted(self._entries())
+        size = sum(e[1] for e in entries)
+        target = self.max_size * EVICT_TARGET if size > limit else size
+        for mtime, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self.size = size
+        self.scanned = self.clock()
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class MetadataCache(object):
+    """
+    Bounded in-memory cache of document metadata. Time to live depends on
+    document status (see `DEFAULT_TTLS`). Concurrent lookups of the same
+    missing key are coalesced: only the first caller fetches, others wait
+    for its result.
+    """
+
+    def __init__(self,
+                 max_entries=DEFAULT_MAX_ENTRIES,
+                 ttls=None,
+                 default_ttl=2.0,
+                 clock=monotonic):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.entries = collections.OrderedDict()
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            return self._get(key)
+
+    def _get(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= self.clock():
+            return None
+        self.entries[key] = entry  # move to the end, as recently used
+        return value
+
+    def set(self, key, document):
+        ttl = self.ttls.get(document.get('status'), self.default_ttl)
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (self.clock() + ttl, document)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def get_or_fetch(self, key, fetch):
+        with self.lock:
+            value = self._get(key)
+            if value is not None:
+                return value
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            return call.wait()
+
+        try:
+            call.value = fetch()
+            self.set(key, call.value)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+        return call.value
@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk operations on Box View documents from the command line:
+
+    boxview upload ./documents/
+    boxview status -i ids.csv -j 16 --rate-limit 20
+    cat ids.txt | boxview download-content --extension .pdf -o pdfs/
+
+Document ids (the first column of CSV) and paths are taken from arguments,
+`--input` file or stdin. Every processed item is printed to stdout as JSON
+line, followed by `{"summary": ...}` line with counts and throughput;
+progress is printed to stderr every `--progress-interval` seconds. Exit
+status is 1 if any item failed.
+"""
+
+import os
+import sys
+import json
+import argparse
+import mimetypes
+
+from .boxview import BoxView, DEFAULT_MAX_WORKERS, API_URL, UPLOAD_URL
+from .ratelimit import monotonic
+from .retry import RetryPolicy
+from .utils import iter_concurrent
+
+__all__ = ['main']
+
+PROGRESS_INTERVAL = 5.0
+
+
+class Reporter(object):
+    """
+    Writes results as JSON lines and counts them. Progress line goes to
+    `progress_stream` at most every `interval` seconds.
+    """
+
+    def __init__(self,
+                 command,
+                 stream,
+                 progress_stream,
+                 interval=PROGRESS_INTERVAL,
+                 clock=monotonic):
+        self.command = command
+        self.stream = stream
+        self.progress_stream = progress_stream
+        self.interval = interval
+        self.clock = clock
+        self.started = clock()
+        self.next_progress = self.started + interval
+        self.done = 0
+        self.failed = 0
+        self.bytes = 0
+
+    def _write(self, stream, data):
+        stream.write(json.dumps(data, sort_keys=True) + '\n')
+        stream.flush()
+
+    def record(self, item, result=None, error=None):
+        if error is not None:
+            self.failed += 1
+            data = dict(item, ok=False, **_error_data(error))
+        else:
+            self.done += 1
+            self.bytes += (result or {}).get('size') or 0
+            data = dict(item, ok=True, **(result or {}))
+        self._write(self.stream, data)
+        self.progress()
+
+    def progress(self, extra=None):
+        """ `extra()` returns more fields, called only if line is due. """
+        if not self.interval or self.clock() < self.next_progress:
+            return
+        self.next_progress = self.clock() + self.interval
+        stats = self.stats()
+        if extra is not None:
+            stats.update(extra())
+        self._write(self.progress_stream, {'progress': stats})
+
+    def stats(self):
+        elapsed = self.clock() - self.started
+        processed = self.done + self.failed
+        return {
+            'command': self.command,
+            'done': self.done,
+            'failed': self.failed,
+            'bytes': self.bytes,
+            'elapsed': round(elapsed, 3),
+            'rate': round(processed / elapsed, 3) if elapsed else 0.0,
+        }
+
+    def summary(self, **extra):
+        """ Writes summary line and returns exit status. """
+        self._write(self.stream, {'summary': dict(self.stats(), **extra)})
+        return 1 if self.failed else 0
+
+
+def _error_data(error):
+    data = {'error': str(error) or error.__class__.__name__}
+    response = getattr(error, 'response', None)
+    if response is not None:
+        data['status_code'] = response.status_code
+    return data
+
+
+def _iter_lines(args):
+    if args.items:
+        for item in args.items:
+            yield item
+        return
+
+    if args.input in (None, '-'):
+        fp = sys.stdin
+    else:
+        fp = open(args.input, 'r')
+    try:
+        for line in fp:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+
+
+def _iter_ids(args):
+    for line in _iter_lines(args):
+        document_id = line.split(',', 1)[0].strip().strip('"')
+        if document_id.lower() not in ('', 'id', 'document_id'):  # header
+            yield document_id
+
+
+def _iter_paths(args):
+    """ Files, urls and files of directories (recursively). """
+    for item in _iter_lines(args):
+        if not os.path.isdir(item):
+            yield item
+            continue
+        for root, dirs, files in os.walk(item):
+            dirs.sort()
+            for filename in sorted(files):
+                if not filename.startswith('.'):
+                    yield os.path.join(root, filename)
+
+
+def _extension(mimetype):
+    if not mimetype:
+        return ''
+    return mimetypes.guess_extension(mimetype) or ''
+
+
+def _upload(api, args, reporter):
+    documents = api.create_documents(_iter_paths(args),
+                                     max_workers=args.workers,
+                                     thumbnails=args.thumbnails or '',
+                                     non_svg=args.non_svg or None)
+    for item, result in documents:
+        if isinstance(result, Exception):
+            reporter.record({'item': item}, error=result)
+        else:
+            reporter.record({'item': item}, {'id': result['id'],
+                                             'status': result['status']})
+
+
+def _status(api, args, reporter):
+    def _get(document_id):
+        document = api.get_document(document_id)
+        return {'status': document['status'], 'name': document.get('name')}
+
+    _run(_get, _iter_ids(args), args, reporter)
+
+
+def _download_content(api, args, reporter):
+    def _download(document_id):
+        filename = os.path.join(args.output_dir,
+                                document_id + (args.extension or ''))
+        mimetype = api.get_document_content_to_file(filename,
+                                                    document_id,
+                                                    args.extension,
+                                                    resume=args.resume,
+                                                    parts=args.parts)
+        if not args.extension and _extension(mimetype):
+            # original format, named after returned content type
+            os.rename(filename, filename + _extension(mimetype))
+            filename += _extension(mimetype)
+        return {'path': filename,
+                'mimetype': mimetype,
+                'size': os.path.getsize(filename)}
+
+    _makedirs(args.output_dir)
+    _run(_download, _iter_ids(args), args, reporter)
+
+
+def _thumbnails(api, args, reporter):
+    _makedirs(args.output_dir)
+    items = ((document_id, args.width, args.height)
+             for document_id in _iter_ids(args))
+    thumbnails = api.get_thumbnails(items,
+                                    max_workers=args.workers,
+                                    not_ready_retries=args.not_ready_retries)
+    for (document_id, width, height), content, mimetype in thumbnails:
+        if isinstance(content, Exception):
+            reporter.record({'id': document_id}, error=content)
+            continue
+        filename = os.path.join(args.output_dir, '{}_{}x{}{}'.format(
+            document_id, width, height, _extension(mimetype)))
+        with open(filename, 'wb') as fp:
+            fp.write(content)
+        reporter.record({'id': document_id}, {'path': filename,
+                                              'mimetype': mimetype,
+                                              'size': len(content)})
+
+
+def _sessions(api, args, reporter):
+    def _create(document_id):
+        session = api.create_session(
+            document_id,
+            duration=args.duration,
+            is_downloadable=args.downloadable or None,
+            is_text_selectable=args.text_selectable or None)
+        return {'session_id': session['id'],
+                'expires_at': session.get('expires_at'),
+                'view_url': api.get_session_url(session['id'])}
+
+    _run(_create, _iter_ids(args), args, reporter)
+
+
+def _purge(api, args, reporter):
+    report = api.purge_documents(
+        args.created_before,
+        max_workers=args.workers,
+        dry_run=args.dry_run,
+        checkpoint=args.checkpoint,
+        progress=lambda report: reporter.progress(report.to_dict))
+    for document_id, error in report.errors:
+        reporter.record({'id': document_id}, error=error)
+    reporter.done = report.deleted + report.would_delete + report.missing
+    return report.to_dict()
+
+
+def _run(func, document_ids, args, reporter):
+    for document_id, result in iter_concurrent(func, document_ids,
+                                               args.workers):
+        if isinstance(result, Exception):
+            reporter.record({'id': document_id}, error=result)
+        else:
+            reporter.record({'id': document_id}, result)
+
+
+def _makedirs(directory):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+
+def _add_input_arguments(parser, name='ids'):
+    parser.add_argument('items', nargs='*', metavar=name.upper(),
+                        help='{} (default: read from --input)'.format(name))
+    parser.add_argument('-i', '--input', metavar='FILE',
+                        help='file with one item per line, `-` for stdin '
+                             '(default)')
+
+
+def create_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--api-key',
+                        default=os.environ.get('BOX_VIEW_API_KEY'),
+                        help='default: $BOX_VIEW_API_KEY')
+    common.add_argument('--base-url', default=API_URL)
+    common.add_argument('--upload-url', default=UPLOAD_URL)
+    common.add_argument('-j', '--workers', type=int,
+                        default=DEFAULT_MAX_WORKERS,
+                        help='concurrent requests (default: %(default)s)')
+    common.add_argument('--rate-limit', type=float, metavar='RPS',
+                        help='max requests per second of all workers')
+    common.add_argument('--retries', type=int, default=5,
+                        help='attempts of throttled or failed request '
+                             '(default: %(default)s)')
+    common.add_argument('--timeout', type=float, metavar='SECONDS')
+    common.add_argument('--transport', choices=['requests', 'urllib3'],
+                        default='requests')
+    common.add_argument('--progress-interval', type=float,
+                        default=PROGRESS_INTERVAL, metavar='SECONDS',
+                        help='0 disables progress (default: %(default)s)')
+
+    parser = argparse.ArgumentParser(
+        prog='boxview',
+        description=__doc__.strip().split('\n\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    subparsers.required = True
+
+    upload = subparsers.add_parser(
+        'upload', parents=[common],
+        help='upload files, files of directories and urls')
+    _add_input_arguments(upload, 'paths')
+    upload.add_argument('--thumbnails', metavar='SIZES',
+                        help='thumbnails to prepare, e.g. 128x128,256x256')
+    upload.add_argument('--non-svg', action='store_true')
+    upload.set_defaults(func=_upload)
+
+    status = subparsers.add_parser(
+        'status', parents=[common], help='print status of documents')
+    _add_input_arguments(status)
+    status.set_defaults(func=_status)
+
+    download = subparsers.add_parser(
+        'download-content', parents=[common],
+        help='download documents content to directory')
+    _add_input_arguments(download)
+    download.add_argument('-o', '--output-dir', default='.')
+    download.add_argument('--extension', choices=['.pdf', '.zip', '.txt'],
+                          help='default: original format')
+    download.add_argument('--resume', action='store_true',
+                          help='continue partially downloaded files')
+    download.add_argument('--parts', type=int, default=1,
+                          help='concurrent range requests per document')
+    download.set_defaults(func=_download_content)
+
+    thumbnails = subparsers.add_parser(
+        'thumbnails', parents=[common],
+        help='download thumbnails to directory')
+    _add_input_arguments(thumbnails)
+    thumbnails.add_argument('-o', '--output-dir', default='.')
+    thumbnails.add_argument('--width', type=int, default=256)
+    thumbnails.add_argument('--height', type=int, default=256)
+    thumbnails.add_argument('--not-ready-retries', type=int, default=3)
+    thumbnails.set_defaults(func=_thumbnails)
+
+    sessions = subparsers.add_parser(
+        'sessions', parents=[common], help='create viewing sessions')
+    _add_input_arguments(sessions)
+    sessions.add_argument('--duration', type=int, metavar='MINUTES')
+    sessions.add_argument('--downloadable', action='store_true')
+    sessions.add_argument('--text-selectable', action='store_true')
+    sessions.set_defaults(func=_sessions)
+
+    purge = subparsers.add_parser(
+        'purge', parents=[common],
+        help='delete all documents created before given time')
+    purge.add_argument('--created-before', required=True, metavar='DATE',
+                       help='e.g. 2015-01-01T00:00:00')
+    purge.add_argument('--dry-run', action='store_true',
+                       help='only count documents')
+    purge.add_argument('--checkpoint', metavar='FILE',
+                       help='resume interrupted purge from this file')
+    purge.set_defaults(func=_purge)
+
+    return parser
+
+
+def main(argv=None):
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error('--api-key or $BOX_VIEW_API_KEY is required')
+
+    api = BoxView(args.api_key,
+                  base_url=args.base_url,
+                  upload_url=args.upload_url,
+                  timeout=args.timeout,
+                  rate_limit=args.rate_limit,
+                  retry=RetryPolicy(max_attempts=args.retries),
+                  pool_maxsize=args.workers,
+                  transport=args.transport)
+    reporter = Reporter(args.command, sys.stdout, sys.stderr,
+                        interval=args.progress_interval)
+    try:
+        extra = args.func(api, args, reporter)
+    except KeyboardInterrupt:
+        reporter.summary(interrupted=True)
+        return 130
+    return reporter.summary(**(extra or {}))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
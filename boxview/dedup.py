@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+__all__ = ['DedupIndex', 'hash_file']
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Returns sha256 hex digest of file (path or seekable file object),
+    reading it in chunks. File object is rewound to its initial position.
+    """
+    import hashlib
+
+    digest = hashlib.sha256()
+    if hasattr(file, 'read'):
+        start = file.tell()
+        fp = file
+    else:
+        start = None
+        fp = open(file, 'rb')
+    try:
+        while True:
+            chunk = fp.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    finally:
+        if start is None:
+            fp.close()
+        else:
+            fp.seek(start)
+    return digest.hexdigest()
+
+
+class DedupIndex(object):
+    """
+    Persistent map of uploaded content hash to document id, stored in
+    SQLite database at `path`. Lets `BoxView.create_document_from_file`
+    return already converted document instead of uploading the same
+    content again.
+    """
+
+    def __init__(self, path):
+        import sqlite3
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS documents ('
+                'digest TEXT PRIMARY KEY, document_id TEXT NOT NULL)')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS documents_document_id '
+                'ON documents (document_id)')
+
+    def get(self, digest):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT document_id FROM documents WHERE digest = ?',
+                (digest,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, digest, document_id):
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO documents (digest, document_id) '
+                'VALUES (?, ?)', (digest, document_id))
+
+    def remove(self, digest):
+        with self.lock, self.connection:
+            self.connection.execute(
+                'DELETE FROM documents WHERE digest = ?', (digest,))
+
+    def remove_document(self, document_id):
+        with self.lock, self.connection:
+            self.connection.execute(
+                'DELETE FROM documents WHERE document_id = ?',
+                (document_id,))
+
+    def close(self):
+        self.connection.close()
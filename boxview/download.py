@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+
+from .boxview import BoxViewError
+from .utils import copy_response, get_mimetype_from_headers, iter_concurrent
+
+__all__ = ['download_resumable', 'download_parts']
+
+PARTIAL_SUFFIX = '.boxview-partial'
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+# offsets and lengths must refer to the stored bytes, not to compressed body
+IDENTITY = {'Accept-Encoding': 'identity'}
+
+
+def parse_content_range(value):
+    """ Returns `(start, end, total)` from `Content-Range` header. """
+    match = CONTENT_RANGE_RE.match((value or '').strip())
+    if not match:
+        return None
+    start, end, total = match.groups()
+    return int(start), int(end), None if total == '*' else int(total)
+
+
+def _load_state(filename):
+    try:
+        with open(filename, 'r') as fp:
+            return json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _save_state(filename, response):
+    length = response.headers.get('Content-Length')
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        length = None  # server ignored `IDENTITY`, length isn't known
+    state = {
+        'etag': response.headers.get('ETag'),
+        'length': int(length) if length else None,
+    }
+    with open(filename, 'w') as fp:
+        json.dump(state, fp)
+    return state
+
+
+def download_resumable(api, filename, url, chunk_size):
+    """
+    Downloads `url` to `filename`, continuing partial download left by
+    previous call. Progress is kept in `<filename>.boxview-partial` till
+    download is finished. Partial file is appended only if server returns
+    the requested range of the same (by `ETag` and length) content;
+    otherwise file is downloaded from scratch.
+    """
+    state_filename = filename + PARTIAL_SUFFIX
+    state = _load_state(state_filename)
+    offset = 0
+    if state is not None and os.path.exists(filename):
+        offset = os.path.getsize(filename)
+
+    headers = dict(IDENTITY)
+    if offset:
+        headers['Range'] = 'bytes={}-'.format(offset)
+        if state.get('etag'):
+            headers['If-Range'] = state['etag']
+
+    try:
+        response = api.request('GET', url, headers=headers, stream=True)
+    except BoxViewError as e:
+        if not offset or e.response.status_code != 416:
+            raise
+        # range is not satisfiable, so partial file is broken
+        os.remove(state_filename)
+        return download_resumable(api, filename, url, chunk_size)
+
+    try:
+        mode = 'wb'
+        if response.status_code == 206:
+            content_range = parse_content_range(
+                response.headers.get('Content-Range'))
+            if (content_range is not None and
+                    content_range[0] == offset and
+                    content_range[2] == state.get('length')):
+                mode = 'ab'
+            else:
+                # not the content we've started to download
+                response.close()
+                os.remove(state_filename)
+                return download_resumable(api, filename, url, chunk_size)
+
+        if mode == 'wb':
+            state = _save_state(state_filename, response)
+
+        with open(filename, mode) as fp:
+            copy_response(response, fp, chunk_size)
+    except Exception:
+        response.close()
+        raise
+
+    size = os.path.getsize(filename)
+    if state['length'] is not None and size != state['length']:
+        raise IOError("Incomplete download: got {} of {} bytes".format(
+            size, state['length']))
+    os.remove(state_filename)
+    return get_mimetype_from_headers(response.headers)
+
+
+def download_parts(api, filename, url, parts, chunk_size):
+    """
+    Downloads `url` to `filename` with `parts` concurrent range requests,
+    each written at its own offset of preallocated file. Falls back to
+    single request when server doesn't support ranges.
+    """
+    response = api.request('HEAD', url, headers=IDENTITY)
+    length = int(response.headers.get('Content-Length') or 0)
+    etag = response.headers.get('ETag')
+    mimetype = get_mimetype_from_headers(response.headers)
+
+    if (response.headers.get('Accept-Ranges') != 'bytes' or not length or
+            response.headers.get('Content-Encoding', 'identity') !=
+            'identity'):
+        with open(filename, 'wb') as fp:
+            return api._download(fp, url, chunk_size, headers=IDENTITY)
+
+    with open(filename, 'wb') as fp:
+        fp.truncate(length)
+
+    part_size = -(-length // parts)
+    ranges = [(start, min(start + part_size, length) - 1)
+              for start in range(0, length, part_size)]
+
+    def _fetch(byte_range):
+        headers = dict(IDENTITY, Range='bytes={}-{}'.format(*byte_range))
+        if etag:
+            headers['If-Range'] = etag
+        response = api.request('GET', url, headers=headers, stream=True)
+        try:
+            content_range = parse_content_range(
+                response.headers.get('Content-Range'))
+            if (response.status_code != 206 or content_range is None or
+                    content_range[:2] != byte_range):
+                raise ValueError(
+                    "Server ignored range request 'bytes={}-{}'".format(
+                        *byte_range))
+            with open(filename, 'r+b') as fp:
+                fp.seek(byte_range[0])
+                copy_response(response, fp, chunk_size)
+        finally:
+            response.close()
+
+    for byte_range, result in iter_concurrent(_fetch, ranges, parts):
+        if isinstance(result, Exception):
+            raise result
+
+    return mimetype
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+import re
+import math
+import bisect
+import threading
+
+__all__ = ['Instrument', 'RequestInfo', 'Histogram', 'MetricsCollector',
+           'endpoint_template']
+
+# ids of documents and sessions are replaced to get low-cardinality names
+ENDPOINT_RE = re.compile(r'\b(documents|sessions|sse)/[^/?#]+')
+
+# scheme, host and api version of absolute urls
+PREFIX_RE = re.compile(r'^(?:[a-z]+://[^/]+)?/*(?:\d+/)?')
+
+# 1ms to ~2 minutes, each bucket ~19% wider than previous one
+DEFAULT_BUCKETS = tuple(0.001 * 2 ** (i / 4.0) for i in range(69))
+
+
+def endpoint_template(path):
+    """ `documents/<id>/thumbnail` -> `documents/{id}/thumbnail` """
+    path = PREFIX_RE.sub('', path.split('?', 1)[0], count=1)
+    return ENDPOINT_RE.sub(r'\1/{id}', path)
+
+
+class RequestInfo(object):
+    """
+    One `BoxView.request` call. `elapsed` is total time including retries
+    and rate limiter waits; `ttfb` is time from sending the last attempt
+    till its response headers were received (connection set up, TLS and
+    server time). For streamed responses body is read after the call, so
+    `bytes_received` is `Content-Length` then.
+    """
+
+    __slots__ = ('method', 'url', 'endpoint', 'started', 'status',
+                 'bytes_sent', 'bytes_received', 'ttfb', 'elapsed',
+                 'attempts', 'error')
+
+    def __init__(self, method, url, endpoint, started, bytes_sent):
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint
+        self.started = started
+        self.bytes_sent = bytes_sent
+        self.status = None
+        self.bytes_received = None
+        self.ttfb = None
+        self.elapsed = None
+        self.attempts = 1
+        self.error = None
+
+    @property
+    def retries(self):
+        return self.attempts - 1
+
+    def __repr__(self):
+        return '<RequestInfo {} {} {} {}>'.format(
+            self.method, self.endpoint, self.status, self.elapsed)
+
+
+class Instrument(object):
+    """
+    Base class of `BoxView(instruments=[...])` hooks. `before()` is called
+    when request starts, then either `after()` or `error()` (with
+    `info.error` set) when it's finished.
+    """
+
+    def before(self, info):
+        pass
+
+    def after(self, info):
+        pass
+
+    def error(self, info):
+        pass
+
+
+class Histogram(object):
+    """ Counts of observed values in buckets with given upper bounds. """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q):
+        """ Estimates `q` (0..100) percentile by interpolation in bucket. """
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    return lower
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class _Stats(object):
+
+    def __init__(self, buckets):
+        self.duration = Histogram(buckets)
+        self.ttfb = Histogram(buckets)
+        self.statuses = {}
+        self.errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _format_float(value):
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value))
+
+
+class MetricsCollector(Instrument):
+    """
+    In-process statistics per method and endpoint template: histograms of
+    total time and time to first byte, status and error counts, retries
+    and bytes. `summary()` returns percentiles, `to_prometheus()` text
+    exposition format.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _observe(self, info):
+        key = (info.method, info.endpoint)
+        with self.lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = _Stats(self.buckets)
+            stats.duration.observe(info.elapsed)
+            if info.ttfb is not None:
+                stats.ttfb.observe(info.ttfb)
+            status = info.status or 'error'
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.errors += info.error is not None
+            stats.retries += info.retries
+            stats.bytes_sent += info.bytes_sent or 0
+            stats.bytes_received += info.bytes_received or 0
+
+    after = error = _observe
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    def summary(self):
+        """
+        Returns `{'GET documents/{id}': {'count': ..., 'p50': ...}}`, times
+        are in seconds.
+        """
+        result = {}
+        with self.lock:
+            for (method, endpoint), stats in self.stats.items():
+                duration, ttfb = stats.duration, stats.ttfb
+                result['{} {}'.format(method, endpoint)] = {
+                    'count': duration.count,
+                    'errors': stats.errors,
+                    'retries': stats.retries,
+                    'statuses': dict(stats.statuses),
+                    'bytes_sent': stats.bytes_sent,
+                    'bytes_received': stats.bytes_received,
+                    'mean': duration.sum / duration.count,
+                    'p50': duration.percentile(50),
+                    'p95': duration.percentile(95),
+                    'p99': duration.percentile(99),
+                    'ttfb_p50': ttfb.percentile(50),
+                    'ttfb_p99': ttfb.percentile(99),
+                }
+        return result
+
+    def to_prometheus(self, prefix='boxview'):
+        """ Returns metrics in Prometheus text exposition format. """
+        histograms = [
+            ('request_duration_seconds', 'duration',
+             'Total time of API calls, including retries.'),
+            ('request_ttfb_seconds', 'ttfb',
+             'Time till response headers of the last attempt.'),
+        ]
+        counters = [
+            ('request_retries_total', 'retries', 'Retried attempts.'),
+            ('request_sent_bytes_total', 'bytes_sent',
+             'Bytes of request bodies.'),
+            ('request_received_bytes_total', 'bytes_received',
+             'Bytes of response bodies.'),
+        ]
+
+        with self.lock:
+            items = sorted(self.stats.items())
+            lines = []
+            for name, attr, help_text in histograms:
+                name = '{}_{}'.format(prefix, name)
+                lines.append('# HELP {} {}'.format(name, help_text))
+                lines.append('# TYPE {} histogram'.format(name))
+                for (method, endpoint), stats in items:
+                    labels = 'method="{}",endpoint="{}"'.format(
+                        _escape(method), _escape(endpoint))
+                    histogram = getattr(stats, attr)
+                    cumulative = 0
+                    bounds = self.buckets + (float('inf'),)
+                    for bound, count in zip(bounds, histogram.counts):
+                        cumulative += count
+                        lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                            name, labels, _format_float(bound), cumulative))
+                    lines.append('{}_sum{{{}}} {}'.format(
+                        name, labels, _format_float(histogram.sum)))
+                    lines.append('{}_count{{{}}} {}'.format(
+                        name, labels, histogram.count))
+
+            name = '{}_requests_total'.format(prefix)
+            lines.append('# HELP {} API calls by status.'.format(name))
+            lines.append('# TYPE {} counter'.format(name))
+            for (method, endpoint), stats in items:
+                for status, count in sorted(stats.statuses.items(),
+                                            key=lambda item: str(item[0])):
+                    lines.append(
+                        '{}{{method="{}",endpoint="{}",status="{}"}} {}'
+                        .format(name, _escape(method), _escape(endpoint),
+                                status, count))
+
+            for name, attr, help_text in counters:
+                name = '{}_{}'.format(prefix, name)
+                lines.append('# HELP {} {}'.format(name, help_text))
+                lines.append('# TYPE {} counter'.format(name))
+                for (method, endpoint), stats in items:
+                    lines.append('{}{{method="{}",endpoint="{}"}} {}'.format(
+                        name, _escape(method), _escape(endpoint),
+                        getattr(stats, attr)))
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+import six
+
+from .utils import parse_date
+
+__all__ = ['Document', 'DocumentPage', 'Session',
+           'QUEUED', 'PROCESSING', 'DONE', 'ERROR']
+
+QUEUED, PROCESSING, DONE, ERROR = ('queued', 'processing', 'done', 'error')
+
+# every model shares these string objects, so `document.status is DONE`
+STATUSES = dict((status, status)
+                for status in (QUEUED, PROCESSING, DONE, ERROR))
+
+
+def _date_property(key):
+    slot = '_' + key
+
+    def _get(self):
+        value = getattr(self, slot, None)
+        return parse_date(value) if value else None
+    return property(_get, doc="`{}` as `datetime` (UTC).".format(key))
+
+
+class Model(object):
+    """
+    Compact API object with `__slots__` instead of per-object dict. Fields
+    are attributes (`None` if absent in response) and timestamps are kept
+    as received and parsed only when accessed. Model is also readable as
+    the original dict (`doc['id']`, `doc.get('name')`, `to_dict()`), so
+    it can be used wherever response dict was.
+    """
+
+    __slots__ = ('_extra',)
+
+    type = None
+    _fields = ()  # stored as is
+    _dates = ()  # stored as string under `_<key>`
+
+    def __init__(self, data):
+        extra = None
+        for key, value in six.iteritems(data):
+            if key in self._fields:
+                setattr(self, key, value)
+            elif key in self._dates:
+                setattr(self, '_' + key, value)
+            elif key != 'type':
+                if extra is None:
+                    extra = {}
+                extra[key] = value  # unknown field, kept for `to_dict()`
+        self._extra = extra
+
+    def __getattr__(self, name):
+        # called only for unset slots
+        if name in self._fields or name == '_extra':
+            return None
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        if key == 'type':
+            return self.type
+        if key in self._fields:
+            slot = key
+        elif key in self._dates:
+            slot = '_' + key
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        else:
+            raise KeyError(key)
+        try:
+            return object.__getattribute__(self, slot)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def keys(self):
+        keys = ['type']
+        keys.extend(key for key in self._fields + self._dates if key in self)
+        keys.extend(self._extra or ())
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, (Model, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self.id)
+
+
+class Document(Model):
+    """ Document of `get_document` and friends; `status` is interned. """
+
+    __slots__ = ('id', 'status', 'name', '_created_at', '_modified_at')
+
+    type = 'document'
+    _fields = ('id', 'status', 'name')
+    _dates = ('created_at', 'modified_at')
+
+    created_at = _date_property('created_at')
+    modified_at = _date_property('modified_at')
+
+    def __init__(self, data):
+        super(Document, self).__init__(data)
+        status = data.get('status')
+        if status is not None:
+            self.status = STATUSES.get(status, status)
+        created_at = data.get('created_at')
+        if created_at is not None and data.get('modified_at') == created_at:
+            self._modified_at = created_at  # one string for both
+
+
+class Session(Model):
+    """ Viewing session of `create_session`. """
+
+    __slots__ = ('id', 'urls', '_expires_at')
+
+    type = 'session'
+    _fields = ('id', 'urls')
+    _dates = ('expires_at',)
+
+    expires_at = _date_property('expires_at')
+
+
+class DocumentPage(object):
+    """
+    Page of `get_documents` listing: `total_count` and `Document` entries.
+    Iterating the page yields entries; `page['document_collection']` reads
+    as the original dict.
+    """
+
+    __slots__ = ('total_count', 'entries')
+
+    def __init__(self, data):
+        collection = data['document_collection']
+        self.total_count = collection.get('total_count')
+        self.entries = [Document(entry) for entry in collection['entries']]
+
+    def __getitem__(self, key):
+        if key != 'document_collection':
+            raise KeyError(key)
+        return {'total_count': self.total_count, 'entries': self.entries}
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def to_dict(self):
+        return {'document_collection': {
+            'total_count': self.total_count,
+            'entries': [entry.to_dict() for entry in self.entries],
+        }}
+
+    def __repr__(self):
+        return '<DocumentPage {} of {}>'.format(len(self.entries),
+                                                self.total_count)
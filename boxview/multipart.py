@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+import os
+import six
+import mmap
+import uuid
+
+__all__ = ['MultipartEncoder']
+
+# percent-encoding of header parameters as in HTML5 (and urllib3)
+_REPLACEMENTS = dict((six.int2byte(c), '%{:02X}'.format(c).encode('ascii'))
+                     for c in range(0x20) if c != 0x1B)
+_REPLACEMENTS[b'"'] = b'%22'
+_REPLACEMENTS[b'\\'] = b'\\\\'
+
+
+def _to_bytes(value):
+    if isinstance(value, six.binary_type):
+        return value
+    if not isinstance(value, six.string_types):
+        value = str(value)
+    return value.encode('utf-8')
+
+
+def _param(value):
+    value = _to_bytes(value)
+    return b''.join(_REPLACEMENTS.get(value[i:i + 1], value[i:i + 1])
+                    for i in range(len(value)))
+
+
+class MultipartEncoder(object):
+    """
+    File-like `multipart/form-data` body, which is read by HTTP client in
+    small chunks. Only form fields and part headers are kept in memory,
+    file content is read from disk (through mmap when `file` is a path)
+    as the request is sent. `callback(sent, total)` is called after every
+    read to report upload progress.
+    """
+
+    def __init__(self,
+                 fields,
+                 file,
+                 field_name='file',
+                 filename=None,
+                 content_type='application/octet-stream',
+                 callback=None):
+        self.boundary = uuid.uuid4().hex
+        self.callback = callback
+        self._file = None
+        self._mapping = None
+
+        if hasattr(file, 'read'):
+            self.fp = file
+            self.start = file.tell()
+            file.seek(0, os.SEEK_END)
+            self.size = file.tell() - self.start
+            file.seek(self.start)
+        else:
+            self.fp = self._file = open(file, 'rb')
+            self.start = 0
+            self.size = os.fstat(self._file.fileno()).st_size
+            if self.size:
+                self._mapping = mmap.mmap(self._file.fileno(), 0,
+                                          access=mmap.ACCESS_READ)
+
+        if filename is None:
+            filename = os.path.basename(getattr(self.fp, 'name', '') or
+                                        field_name)
+
+        boundary = _to_bytes(self.boundary)
+        head = []
+        for name, value in sorted(fields.items()):
+            head.append(b'--' + boundary + b'\r\n')
+            head.append(b'Content-Disposition: form-data; name="' +
+                        _param(name) + b'"\r\n\r\n')
+            head.append(_to_bytes(value) + b'\r\n')
+        head.append(b'--' + boundary + b'\r\n')
+        head.append(b'Content-Disposition: form-data; name="' +
+                    _param(field_name) + b'"; filename="' +
+                    _param(filename) + b'"\r\n')
+        head.append(b'Content-Type: ' + _to_bytes(content_type) +
+                    b'\r\n\r\n')
+        self.head = b''.join(head)
+        self.tail = b'\r\n--' + boundary + b'--\r\n'
+        self.length = len(self.head) + self.size + len(self.tail)
+        self.position = 0
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary={}'.format(self.boundary)
+
+    def __len__(self):
+        return self.length
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.length
+        self.position = max(0, min(offset, self.length))
+        return self.position
+
+    def _read_file(self, offset, size):
+        if self._mapping is not None:
+            return self._mapping[offset:offset + size]
+        self.fp.seek(self.start + offset)
+        return self.fp.read(size)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length - self.position
+
+        chunks = []
+        while size > 0 and self.position < self.length:
+            position = self.position
+            file_start = len(self.head)
+            file_end = file_start + self.size
+            if position < file_start:
+                chunk = self.head[position:position + size]
+            elif position < file_end:
+                chunk = self._read_file(position - file_start,
+                                        min(size, file_end - position))
+                if not chunk:
+                    raise IOError("File is shorter than expected")
+            else:
+                chunk = self.tail[position - file_end:
+                                  position - file_end + size]
+            chunks.append(chunk)
+            self.position += len(chunk)
+            size -= len(chunk)
+
+        if self.callback is not None:
+            self.callback(self.position, self.length)
+        return b''.join(chunks)
+
+    def close(self):
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import datetime
+import tempfile
+import collections
+
+from .boxview import BoxViewError
+from .ratelimit import monotonic
+from .utils import format_date, iter_concurrent, parse_date
+
+__all__ = ['PurgeReport', 'purge_documents']
+
+CHECKPOINT_INTERVAL = 100
+
+replace = getattr(os, 'replace', os.rename)
+
+
+class PurgeReport(object):
+    """
+    Progress of `purge_documents`: `listed` documents, `deleted` ones
+    (`would_delete` in dry run), `missing` ones (already deleted by someone
+    else) and `errors` as `(document_id, exception)` pairs. Counters
+    include work done before resuming from checkpoint; `rate` is deletions
+    per second of this run.
+    `skipped` counts seconds with more documents than one listing page
+    holds, so only part of them was listed (see `BoxView.iter_documents`);
+    if it isn't 0, purge should be run again to delete the rest.
+    """
+
+    def __init__(self, dry_run=False, clock=monotonic):
+        self.dry_run = dry_run
+        self.clock = clock
+        self.started = clock()
+        self.finished = None
+        self.listed = 0
+        self.deleted = 0
+        self.would_delete = 0
+        self.missing = 0
+        self.errors = []
+        self.skipped = 0
+        self.resumed = 0
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+    @property
+    def elapsed(self):
+        return (self.finished or self.clock()) - self.started
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        if not elapsed:
+            return 0.0
+        return (self.deleted + self.missing - self.resumed) / float(elapsed)
+
+    def to_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'listed': self.listed,
+            'deleted': self.deleted,
+            'would_delete': self.would_delete,
+            'missing': self.missing,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'elapsed': round(self.elapsed, 3),
+            'rate': round(self.rate, 3),
+        }
+
+    def __repr__(self):
+        return '<PurgeReport {}>'.format(self.to_dict())
+
+
+def _load_checkpoint(filename, until):
+    try:
+        with open(filename, 'r') as fp:
+            state = json.load(fp)
+    except (IOError, OSError, ValueError):
+        return None
+    # checkpoint of purge with another cutoff can't be reused
+    return state if state.get('until') == until else None
+
+
+def _save_checkpoint(filename, state):
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    with os.fdopen(fd, 'w') as fp:
+        json.dump(state, fp)
+    replace(tmp_filename, filename)
+
+
+def purge_documents(api,
+                    created_before,
+                    max_workers,
+                    dry_run=False,
+                    checkpoint=None,
+                    progress=None):
+    """
+    Deletes all documents created before `created_before`, `max_workers`
+    at a time, while listing is streamed page by page. With `checkpoint`
+    filename, the oldest `created_at` up to which all listed documents are
+    processed is saved every `CHECKPOINT_INTERVAL` documents, so next call
+    with the same arguments continues from there. Ids of documents which
+    failed to delete are saved too and tried again first, so failures
+    don't hold the checkpoint back. The file is removed when purge is
+    finished. `progress(report)` is called after every document.
+    Returns `PurgeReport`; documents which couldn't be listed are counted
+    by its `skipped`.
+    """
+    until = format_date(created_before)
+    report = PurgeReport(dry_run)
+    state = {'until': until, 'created_before': until,
+             'deleted': 0, 'missing': 0, 'failed': []}
+    if checkpoint is not None and not dry_run:
+        state = _load_checkpoint(checkpoint, until) or state
+        report.deleted, report.missing = state['deleted'], state['missing']
+        report.resumed = report.deleted + report.missing
+    failed, state['failed'] = state.get('failed', []), []
+    retried = set(failed)
+
+    # documents in listing order (newest first) which are being processed;
+    # everything before the first of them is done
+    listed = collections.deque()
+    done = set()
+
+    def _skip(created_at):
+        report.skipped += 1
+
+    def _list():
+        for document_id in failed:
+            yield {'id': document_id}  # not listed, doesn't move checkpoint
+        created_before = state['created_before']
+        if created_before != until:
+            # rest of the second checkpoint stopped at isn't done, list all
+            # of it whether API compares `created_before` inclusively or not
+            resumed = (parse_date(created_before) +
+                       datetime.timedelta(seconds=1))
+            if resumed < parse_date(until + 'T00:00:00'):  # may be a date
+                created_before = resumed
+            else:
+                created_before = until
+        documents = api.iter_documents(created_before=created_before,
+                                       on_skip=_skip)
+        for document in documents:
+            if document['id'] in retried:
+                continue  # tried again already
+            report.listed += 1
+            listed.append((document['id'], document['created_at']))
+            yield document
+
+    def _delete(document):
+        if dry_run:
+            return True
+        try:
+            api.delete_document(document['id'])
+        except BoxViewError as e:
+            if e.response.status_code != 404:
+                raise
+            return False
+        return True
+
+    def _save():
+        state['deleted'], state['missing'] = report.deleted, report.missing
+        _save_checkpoint(checkpoint, state)
+
+    use_checkpoint = checkpoint is not None and not dry_run
+    processed = 0
+    try:
+        for document, result in iter_concurrent(_delete, _list(),
+                                                max_workers):
+            if isinstance(result, Exception):
+                report.errors.append((document['id'], result))
+                state['failed'].append(document['id'])
+            elif dry_run:
+                report.would_delete += 1
+            elif result:
+                report.deleted += 1
+            else:
+                report.missing += 1
+
+            if 'created_at' in document:
+                done.add(document['id'])
+                while listed and listed[0][0] in done:
+                    document_id, state['created_before'] = listed.popleft()
+                    done.discard(document_id)
+
+            processed += 1
+            if use_checkpoint and processed % CHECKPOINT_INTERVAL == 0:
+                _save()
+
+            if progress is not None:
+                progress(report)
+    except BaseException:
+        if use_checkpoint:
+            _save()
+        raise
+
+    if use_checkpoint:
+        try:
+            os.remove(checkpoint)
+        except OSError:
+            pass
+
+    report.finished = report.clock()
+    return report
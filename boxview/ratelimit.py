@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+__all__ = ['RateLimiter']
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+class RateLimiter(object):
+    """
+    Token bucket shared by all threads using one client. `rate` is allowed
+    requests per second (`None` means unlimited), `burst` is bucket size.
+    After `pause()` every caller waits till the pause is over, then tokens
+    are refilled from zero, so waiting threads don't retry all at once.
+    """
+
+    def __init__(self, rate=None, burst=None, clock=monotonic,
+                 sleep=time.sleep):
+        self.rate = float(rate) if rate else None
+        self.capacity = float(burst or max(1, self.rate or 1))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity,
+                              self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def reserve(self):
+        """
+        Takes a token if one is available; otherwise returns number of
+        seconds to wait before trying again.
+        """
+        with self.lock:
+            now = self.clock()
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.rate is None:
+                return 0
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            delay = self.reserve()
+            if delay <= 0:
+                return
+            self.sleep(delay)
+
+    def pause(self, seconds):
+        with self.lock:
+            until = self.clock() + seconds
+            if until > self.paused_until:
+                self.paused_until = until
+                self.tokens = 0.0
+                self.updated = until
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import time
+import random
+
+from .ratelimit import monotonic
+
+__all__ = ['RetryPolicy']
+
+RETRY_STATUSES = frozenset([202, 429, 500, 502, 503, 504])
+
+# 5xx (e.g. from proxy) may come after the request was done, so requests
+# creating something (`POST` of documents or sessions) aren't repeated
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+class RetryPolicy(object):
+    """
+    Describes how `BoxView.request` retries failed calls. Delay between
+    attempts is exponential backoff with full jitter, but never less than
+    server's `Retry-After`. `deadline` limits total time spent in request
+    including waits. Throttled requests (`429` or `Retry-After`) are retried
+    whatever the method is, other failures only for `retry_methods` (`None`
+    means all methods).
+    """
+
+    def __init__(self,
+                 max_attempts=3,
+                 backoff_base=0.5,
+                 backoff_max=60.0,
+                 jitter=True,
+                 retry_statuses=RETRY_STATUSES,
+                 retry_methods=IDEMPOTENT_METHODS,
+                 deadline=None,
+                 clock=monotonic,
+                 sleep=time.sleep):
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_methods = (frozenset(m.upper() for m in retry_methods)
+                              if retry_methods is not None else None)
+        self.deadline = deadline
+        self.clock = clock
+        self.sleep = sleep
+
+    def backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def get_delay(self, error, attempt, elapsed, method=None):
+        """
+        Returns seconds to wait before next attempt of `method` request
+        after `error`, or `None` if request shouldn't be retried.
+        """
+        if attempt >= self.max_attempts:
+            return None
+        response = getattr(error, 'response', None)
+        if response is None or response.status_code not in self.retry_statuses:
+            return None
+        throttled = (response.status_code == 429 or
+                     'Retry-After' in response.headers)
+        if (not throttled and method is not None and
+                self.retry_methods is not None and
+                method.upper() not in self.retry_methods):
+            return None
+        delay = max(getattr(error, 'seconds', 0), self.backoff(attempt))
+        if self.deadline is not None and elapsed + delay > self.deadline:
+            return None
+        return delay
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import threading
+import collections
+
+from .boxview import BoxViewError
+from .ratelimit import monotonic
+from .utils import parse_date
+
+__all__ = ['SessionPool']
+
+DEFAULT_DURATION = 60  # minutes, as `create_session` expects
+
+DEFAULT_MIN_TTL = 600.0
+
+ERROR_DELAY = 5.0
+
+
+class _Ready(object):
+
+    __slots__ = ('session', 'expires')
+
+    def __init__(self, session, expires):
+        self.session = session
+        self.expires = expires
+
+
+class SessionPool(object):
+    """
+    Keeps `size` pre-created view sessions for each of `max_documents`
+    recently used documents, so viewer URL is handed out without waiting
+    for `create_session`. Every session is handed out once. Sessions are
+    replaced in background `min_ttl` seconds before they expire, and
+    sessions of evicted documents are deleted. Document whose sessions
+    can't be created is backed off for `ERROR_DELAY` seconds (and dropped
+    from the pool if it doesn't exist), others are filled meanwhile:
+
+        pool = SessionPool(api, size=2)
+        pool.start()
+        url = pool.get_url(document_id)
+        ...
+        pool.close()
+    """
+
+    def __init__(self,
+                 api,
+                 size=2,
+                 max_documents=100,
+                 duration=DEFAULT_DURATION,
+                 min_ttl=DEFAULT_MIN_TTL,
+                 is_downloadable=None,
+                 is_text_selectable=None,
+                 clock=monotonic,
+                 utcnow=datetime.datetime.utcnow):
+        if min_ttl >= duration * 60:
+            raise ValueError("min_ttl must be shorter than session duration")
+        self.api = api
+        self.size = size
+        self.max_documents = max_documents
+        self.duration = duration
+        self.min_ttl = min_ttl
+        self.options = {
+            'is_downloadable': is_downloadable,
+            'is_text_selectable': is_text_selectable,
+        }
+        self.clock = clock
+        self.utcnow = utcnow
+        self.documents = collections.OrderedDict()
+        self.stale = []
+        self.backoff = {}  # document id -> time to retry after error
+        self.hits = self.misses = 0
+        self.error = None
+        self.closed = False
+        self.thread = None
+        self.condition = threading.Condition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _touch(self, document_id):
+        """ Marks document as recently used; caller holds the lock. """
+        sessions = self.documents.pop(document_id, None)
+        if sessions is None:
+            sessions = collections.deque()
+        self.documents[document_id] = sessions
+        while len(self.documents) > self.max_documents:
+            evicted_id, evicted = self.documents.popitem(last=False)
+            self.backoff.pop(evicted_id, None)
+            self.stale.extend(ready.session for ready in evicted)
+        return sessions
+
+    def add(self, document_id):
+        """ Starts keeping sessions for document before it's requested. """
+        with self.condition:
+            self._touch(document_id)
+            self.condition.notify_all()
+
+    def discard(self, document_id):
+        with self.condition:
+            sessions = self.documents.pop(document_id, ())
+            self.backoff.pop(document_id, None)
+            self.stale.extend(ready.session for ready in sessions)
+            self.condition.notify_all()
+
+    def get(self, document_id):
+        """
+        Returns session dict (as returned by `create_session`) for document,
+        from the pool when there is one, otherwise created right away.
+        """
+        with self.condition:
+            sessions = self._touch(document_id)
+            session, now = None, self.clock()
+            while sessions:
+                ready = sessions.popleft()
+                if ready.expires - now >= self.min_ttl:
+                    session = ready.session
+                    break
+                self.stale.append(ready.session)
+            if session is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self.condition.notify_all()
+
+        if session is None:
+            session = self._create(document_id).session
+        return session
+
+    def get_url(self, document_id, type='view', **params):
+        session = self.get(document_id)
+        return self.api.get_session_url(session['id'], type, **params)
+
+    def _create(self, document_id):
+        started = self.clock()
+        session = self.api.create_session(document_id,
+                                          duration=self.duration,
+                                          **self.options)
+        expires = started + self.duration * 60
+        if session.get('expires_at'):
+            remaining = parse_date(session['expires_at']) - self.utcnow()
+            expires = min(expires, self.clock() + remaining.total_seconds())
+        return _Ready(session, expires)
+
+    def _delete(self, sessions):
+        for session in sessions:
+            try:
+                self.api.delete_session(session['id'])
+            except BoxViewError:
+                pass  # already expired
+
+    def refresh(self):
+        """
+        Deletes stale sessions and fills the pool up. Returns time (by
+        `clock`) when the next session is due to be replaced.
+        """
+        with self.condition:
+            now = self.clock()
+            wanted = []
+            for document_id, sessions in self.documents.items():
+                for ready in list(sessions):
+                    if ready.expires - now < self.min_ttl:
+                        sessions.remove(ready)
+                        self.stale.append(ready.session)
+                if self.backoff.get(document_id, now) <= now:
+                    wanted.extend([document_id] * (self.size - len(sessions)))
+            stale, self.stale = self.stale, []
+
+        self._delete(stale)
+
+        error, failed = None, set()
+        for document_id in wanted:
+            if document_id in failed:
+                continue
+            try:
+                ready = self._create(document_id)
+            except BoxViewError as e:
+                error = e
+                failed.add(document_id)
+                if e.response is not None and e.response.status_code == 404:
+                    self.discard(document_id)  # document was deleted
+                else:
+                    with self.condition:
+                        if document_id in self.documents:
+                            self.backoff[document_id] = (self.clock() +
+                                                         ERROR_DELAY)
+                continue
+            with self.condition:
+                self.backoff.pop(document_id, None)
+                sessions = self.documents.get(document_id)
+                if sessions is not None and len(sessions) < self.size:
+                    sessions.append(ready)
+                    ready = None
+            if ready is not None:
+                self._delete([ready.session])  # document was evicted
+
+        self.error = error
+        with self.condition:
+            times = [ready.expires - self.min_ttl
+                     for sessions in self.documents.values()
+                     for ready in sessions]
+            times.extend(self.backoff.values())
+        return min(times) if times else None
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.closed:
+                    return
+            try:
+                next_refresh = self.refresh()
+            except Exception as e:
+                self.error = e
+                # don't let `get()` calls wake us up till the delay is over
+                deadline = self.clock() + ERROR_DELAY
+                with self.condition:
+                    while not self.closed and self.clock() < deadline:
+                        self.condition.wait(deadline - self.clock())
+                continue
+
+            with self.condition:
+                if self.closed or self.stale or self._missing():
+                    continue
+                if next_refresh is None:
+                    self.condition.wait()
+                else:
+                    self.condition.wait(max(0, next_refresh - self.clock()))
+
+    def _missing(self):
+        now = self.clock()
+        return any(len(sessions) < self.size and
+                   self.backoff.get(document_id, now) <= now
+                   for document_id, sessions in self.documents.items())
+
+    def start(self):
+        """ Starts background thread keeping the pool filled. """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run,
+                                           name='boxview-session-pool')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def close(self):
+        """ Stops background thread and deletes all pooled sessions. """
+        with self.condition:
+            self.closed = True
+            for sessions in self.documents.values():
+                self.stale.extend(ready.session for ready in sessions)
+            self.documents.clear()
+            stale, self.stale = self.stale, []
+            self.condition.notify_all()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self._delete(stale)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import time
+import collections
+
+__all__ = ['Event', 'EventParser', 'iter_events']
+
+FINISHED = 'finished'
+
+DEFAULT_RETRY = 3.0
+
+Event = collections.namedtuple('Event', ['id', 'event', 'data'])
+
+
+class EventParser(object):
+    """
+    Incremental `text/event-stream` parser. Feed it raw chunks as they
+    arrive; only unfinished line is kept in buffer.
+    """
+
+    def __init__(self):
+        self.buffer = b''
+        self.data = []
+        self.event = None
+        self.last_event_id = None
+        self.retry = None
+
+    def feed(self, chunk):
+        """ Returns list of events completed by `chunk`. """
+        events = []
+        lines = (self.buffer + chunk).split(b'\n')
+        self.buffer = lines.pop()
+        for line in lines:
+            event = self._parse_line(line.rstrip(b'\r').decode('utf-8'))
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _parse_line(self, line):
+        if not line:
+            return self._dispatch()
+        if line.startswith(':'):
+            return None
+
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+
+        if field == 'data':
+            self.data.append(value)
+        elif field == 'event':
+            self.event = value
+        elif field == 'id' and '\0' not in value:
+            self.last_event_id = value
+        elif field == 'retry' and value.isdigit():
+            self.retry = int(value) / 1000.0
+
+    def _dispatch(self):
+        data, event = self.data, self.event
+        self.data, self.event = [], None
+        if not data:
+            return None
+        return Event(self.last_event_id, event or 'message', '\n'.join(data))
+
+
+def iter_events(api,
+                url,
+                last_event_id=None,
+                reconnect=True,
+                max_reconnects=5,
+                end_events=(FINISHED,),
+                sleep=time.sleep):
+    """
+    Yields events from server-sent events stream at `url`. When connection
+    drops, it is re-established with `Last-Event-ID`, so no event is lost.
+    Iteration stops after one of `end_events` or when server replies with
+    `204 No Content`. Failed reconnect attempts count against
+    `max_reconnects` too; error of the last one is raised.
+    """
+    from requests.exceptions import (
+        ConnectionError, ChunkedEncodingError, Timeout
+    )
+
+    retry, reconnects, connected = DEFAULT_RETRY, 0, False
+    while True:
+        headers = {'Accept': 'text/event-stream', 'Cache-Control': 'no-cache'}
+        if last_event_id:
+            headers['Last-Event-ID'] = last_event_id
+
+        try:
+            response = api.request('GET', url, headers=headers, stream=True)
+        except (ConnectionError, Timeout):
+            # the first connection isn't retried, nor is the last reconnect
+            if (not connected or not reconnect or
+                    reconnects >= max_reconnects):
+                raise
+            response = None
+
+        if response is not None:
+            connected = True
+            if response.status_code == 204:
+                return
+
+            parser = EventParser()
+            parser.last_event_id = last_event_id
+            try:
+                for chunk in response.iter_content(chunk_size=None):
+                    for event in parser.feed(chunk):
+                        last_event_id = event.id
+                        reconnects = 0
+                        yield event
+                        if event.event in end_events:
+                            return
+            except (ConnectionError, ChunkedEncodingError):
+                pass
+            finally:
+                response.close()
+                if parser.retry is not None:
+                    retry = parser.retry
+
+        reconnects += 1
+        if not reconnect or reconnects > max_reconnects:
+            return
+        sleep(retry)
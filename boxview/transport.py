@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+
+import six
+from six.moves.urllib.parse import urlencode
+
+from .ratelimit import monotonic
+from .utils import SessionProvider, pool_stats, DEFAULT_POOLSIZE
+
+__all__ = ['Transport', 'RequestsTransport', 'Urllib3Transport']
+
+
+class Transport(object):
+    """
+    Sends requests of `BoxView`. `send()` takes the same arguments as
+    `requests.Session.request` (`params`, `data`, `headers`, `stream`,
+    `timeout`, `allow_redirects`) and returns `requests.Response`.
+    """
+
+    def send(self, method, url, **kwargs):
+        raise NotImplementedError()
+
+    def pool_stats(self):
+        return {}
+
+
+class RequestsTransport(Transport):
+    """ Default transport, through `requests.Session` of `sessions`. """
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    def send(self, method, url, **kwargs):
+        return self.sessions.get().request(method, url, **kwargs)
+
+    def pool_stats(self):
+        return pool_stats(self.sessions.get())
+
+
+def _timeout(value):
+    import urllib3
+
+    if value is None:
+        return urllib3.Timeout()
+    if isinstance(value, tuple):
+        return urllib3.Timeout(connect=value[0], read=value[1])
+    return urllib3.Timeout(connect=value, read=value)
+
+
+class Urllib3Transport(Transport):
+    """
+    Lean transport straight over urllib3 connection pools, without
+    per-request overhead of `requests.Session` (hooks, cookies, settings
+    merging, request preparation). Default headers are built once, so
+    each call only merges headers it adds. Supports what `BoxView`
+    needs and no more: e.g. environment proxies and `.netrc` are ignored.
+    """
+
+    def __init__(self,
+                 headers,
+                 max_retries=3,
+                 pool_connections=DEFAULT_POOLSIZE,
+                 pool_maxsize=DEFAULT_POOLSIZE,
+                 pool_block=False):
+        import urllib3
+
+        self.headers = dict(headers)
+        self.retries = urllib3.Retry(max_retries, read=False, redirect=30,
+                                     raise_on_redirect=False)
+
+        def _create_pool_manager():
+            return urllib3.PoolManager(num_pools=pool_connections,
+                                       maxsize=pool_maxsize,
+                                       block=pool_block)
+        # pooled connections can't be shared with forked processes
+        self.pool_managers = SessionProvider(_create_pool_manager)
+
+    def send(self,
+             method,
+             url,
+             params=None,
+             data=None,
+             headers=None,
+             files=None,
+             stream=False,
+             timeout=None,
+             allow_redirects=True):
+        import urllib3
+        from requests import exceptions
+        from requests.models import Response
+        from requests.structures import CaseInsensitiveDict
+
+        if params:
+            url = '{}{}{}'.format(url, '&' if '?' in url else '?',
+                                  urlencode(params))
+
+        if headers:
+            headers = dict(self.headers, **headers)
+        else:
+            headers = self.headers
+
+        if files:
+            fields = dict(data or {})
+            for name, file in files.items():
+                filename = getattr(file, 'name', name)
+                fields[name] = (filename, file.read())
+            data, content_type = urllib3.encode_multipart_formdata(fields)
+            headers = dict(headers, **{'Content-Type': content_type})
+        elif isinstance(data, dict):
+            data = urlencode(data)
+            headers = dict(headers, **{
+                'Content-Type': 'application/x-www-form-urlencoded'})
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+        if data is not None and not isinstance(data, six.binary_type):
+            # file-like body (e.g. `MultipartEncoder`) of known length
+            headers = dict(headers, **{'Content-Length': str(len(data))})
+
+        started = monotonic()
+        try:
+            raw = self.pool_managers.get().urlopen(
+                method, url,
+                body=data,
+                headers=headers,
+                retries=self.retries,
+                redirect=allow_redirects,
+                timeout=_timeout(timeout),
+                preload_content=False,
+                decode_content=False)
+        except urllib3.exceptions.MaxRetryError as e:
+            # `NewConnectionError` is a subclass of `ConnectTimeoutError`
+            if (isinstance(e.reason, urllib3.exceptions.TimeoutError) and
+                    not isinstance(e.reason,
+                                   urllib3.exceptions.NewConnectionError)):
+                raise exceptions.ConnectTimeout(e)
+            raise exceptions.ConnectionError(e)
+        except urllib3.exceptions.TimeoutError as e:
+            raise exceptions.Timeout(e)
+        except urllib3.exceptions.HTTPError as e:
+            raise exceptions.ConnectionError(e)
+
+        response = Response()
+        response.status_code = raw.status
+        response.headers = CaseInsensitiveDict(raw.headers)
+        response.raw = raw
+        response.reason = raw.reason
+        response.url = url
+        response.elapsed = datetime.timedelta(seconds=monotonic() - started)
+        if not stream:
+            response.content  # read body and return connection to pool
+        return response
+
+    def pool_stats(self):
+        return pool_stats(self.pool_managers.get())
@@ -1,42 +1,160 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import cgi
+import os
 import six
 import json
+import weakref
 import datetime
-import urllib
+import itertools
+import threading
 if six.PY3:
     from urllib import parse as urlparse
     from urllib.parse import urlencode
 else:
     import urlparse
     from urllib import urlencode
-import requests
-from requests.structures import CaseInsensitiveDict
-from requests.adapters import HTTPAdapter
-from requests.utils import default_user_agent
 
+# `requests` is imported by functions which need it, so `import boxview`
+# stays cheap for code which only builds urls
 
-__all__ = ['default_headers', 'default_session', 'add_to_url', 'format_date',
-           'get_mimetype_from_headers', 'format_error_response']
+
+__all__ = ['default_headers', 'default_session', 'SessionProvider',
+           'pool_stats', 'add_to_url',
+           'format_date', 'get_mimetype_from_headers', 'format_error_response',
+           'parse_date', 'iter_concurrent', 'copy_response', 'Tee']
+
+DEFAULT_POOLSIZE = 10
 
 
 def default_headers():
-    return CaseInsensitiveDict({
-        'User-Agent': ' '.join(['python-boxview/1.0', default_user_agent()]),
+    return {
+        'User-Agent': 'python-boxview/1.0',
         'Accept': '*/*',
         'Accept-Encoding': ', '.join(('gzip', 'deflate', 'compress')),
-    })
+    }
+
 
+def default_session(max_retries=3,
+                    pool_connections=DEFAULT_POOLSIZE,
+                    pool_maxsize=DEFAULT_POOLSIZE,
+                    pool_block=False,
+                    hosts=None):
+    """
+    Creates session with connection pools of given size. `hosts` maps url
+    prefix (e.g. `https://upload.view-api.box.com/`) to dict of adapter
+    options overriding defaults for that host.
+    """
+    options = {
+        'max_retries': max_retries,
+        'pool_connections': pool_connections,
+        'pool_maxsize': pool_maxsize,
+        'pool_block': pool_block,
+    }
+    import requests
+    from requests.adapters import HTTPAdapter
 
-def default_session(max_retries=3):
     session = requests.Session()
-    session.mount('http://', HTTPAdapter(max_retries=max_retries))
-    session.mount('https://', HTTPAdapter(max_retries=max_retries))
+    session.mount('http://', HTTPAdapter(**options))
+    session.mount('https://', HTTPAdapter(**options))
+    for prefix, host_options in (hosts or {}).items():
+        session.mount(prefix, HTTPAdapter(**dict(options, **host_options)))
     return session
 
 
+# fork hooks can't be unregistered, so one hook resets all live providers
+_providers = weakref.WeakSet()
+
+
+def _reset_providers():
+    for provider in list(_providers):
+        provider._reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_providers)
+
+
+class SessionProvider(object):
+    """
+    Creates sessions with `factory` on demand. A new session is created in
+    every process (after `fork` pooled connections of parent can't be
+    used by child), and with `per_thread=True` also in every thread.
+    Provider made for existing `session` always returns it.
+    """
+
+    def __init__(self, factory=None, per_thread=False, session=None):
+        if factory is None and session is None:
+            raise ValueError("Session factory or session is required")
+        self.factory = factory
+        self.per_thread = per_thread
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.pid = os.getpid() if session is not None else None
+        self.session = session
+
+        if factory is not None:
+            _providers.add(self)
+
+    def _reset(self):
+        # lock could be held by another thread of parent process
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.pid, self.session = None, None
+
+    def get(self):
+        if self.factory is None:
+            return self.session
+
+        pid = os.getpid()
+        if self.per_thread:
+            local = self.local
+            if getattr(local, 'pid', None) != pid:
+                local.session, local.pid = self.factory(), pid
+            return local.session
+
+        if self.pid != pid:
+            with self.lock:
+                if self.pid != pid:
+                    self.session, self.pid = self.factory(), pid
+        return self.session
+
+
+def pool_stats(session):
+    """
+    Returns statistics of connection pools opened by session (or urllib3
+    pool manager), keyed by `scheme://host:port`: connections `in_use`,
+    `idle`, `created`, number of `requests` and `reused` (requests sent
+    over existing connection).
+    """
+    if hasattr(session, 'adapters'):
+        managers = [getattr(adapter, 'poolmanager', None)
+                    for adapter in set(session.adapters.values())]
+    else:
+        managers = [session]
+
+    stats = {}
+    for manager in managers:
+        pools = getattr(manager, 'pools', None)
+        if pools is None:
+            continue
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            idle = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+            name = '{}://{}:{}'.format(pool.scheme, pool.host, pool.port)
+            stats[name] = {
+                'maxsize': pool.pool.maxsize,
+                'in_use': pool.pool.maxsize - pool.pool.qsize(),
+                'idle': idle,
+                'created': pool.num_connections,
+                'requests': pool.num_requests,
+                'reused': max(0, pool.num_requests - pool.num_connections),
+            }
+    return stats
+
+
 def add_to_url(url, **params):
     parts = list(urlparse.urlparse(url))
     query = dict(urlparse.parse_qsl(parts[4]), **params)
@@ -54,7 +172,8 @@ def pretty_json(data):
 def get_mimetype_from_headers(headers):
     content_type = headers.get('Content-Type')
     if content_type:
-        return cgi.parse_header(content_type)[0].lower()
+        # parameters (e.g. `charset`) are not needed, so no full parser
+        return content_type.split(';', 1)[0].strip().lower()
 
 
 def format_error_response(response):
@@ -75,3 +194,82 @@ def format_date(value):
         return value.isoformat()
 
     raise ValueError("Invalid date: {}".format(value))
+
+
+def parse_date(value):
+    """
+    Parses API timestamp like `2013-08-30T00:17:37Z` (fraction of second
+    and timezone are ignored, API always returns UTC).
+    """
+    return datetime.datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+
+
+def copy_response(response, stream, chunk_size):
+    """
+    Writes body of streamed response to `stream`. Body without
+    `Content-Encoding` is read with `readinto` straight into one reused
+    buffer, so no new bytes object is created for every chunk.
+    """
+    raw = response.raw
+    encoding = response.headers.get('Content-Encoding', 'identity')
+    if (encoding.lower() != 'identity' or
+            not hasattr(raw, 'readinto') or
+            getattr(response, '_content_consumed', False)):
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            stream.write(chunk)
+        return
+
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    while True:
+        size = raw.readinto(buf)
+        if not size:
+            break
+        stream.write(view[:size] if six.PY3 else bytes(buf[:size]))
+    response._content_consumed = True
+
+
+class Tee(object):
+    """ File-like object writing data to all given streams. """
+
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def write(self, data):
+        for stream in self.streams:
+            stream.write(data)
+
+
+def iter_concurrent(func, items, max_workers=8):
+    """
+    Calls `func` for every item in thread pool and yields `(item, result)`
+    pairs as they complete. Exception raised by `func` is yielded as result.
+    Only `2 * max_workers` items are taken from `items` at a time, so
+    input may be arbitrary long iterator.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    items = iter(items)
+    backlog = max_workers * 2
+    pending = {}
+    executor = ThreadPoolExecutor(max_workers)
+    try:
+        for item in itertools.islice(items, backlog):
+            pending[executor.submit(func, item)] = item
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                yield item, result
+
+            for item in itertools.islice(items, backlog - len(pending)):
+                pending[executor.submit(func, item)] = item
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import itertools
+import threading
+import collections
+
+from .boxview import BoxViewError, DONE, ERROR, MAX_PAGE_SIZE
+from .models import Model
+from .ratelimit import monotonic
+from .utils import parse_date
+
+__all__ = ['DocumentWatcher']
+
+
+class _Pending(object):
+
+    __slots__ = ('id', 'created_at', 'added', 'next_poll', 'status',
+                 'callback')
+
+    def __init__(self, document_id, created_at, added, callback):
+        self.id = document_id
+        self.created_at = created_at
+        self.added = added
+        self.next_poll = added
+        self.status = None
+        self.callback = callback
+
+
+class DocumentWatcher(object):
+    """
+    Waits till many documents are converted. Each pending document is polled
+    with its own interval, which grows with time the document is waiting.
+    When at least `list_threshold` documents created close to each other
+    (within `cluster_gap` seconds) are due at once, they are checked by
+    `get_documents` listing paged through their `created_at` window. Listing
+    of a group stops after `MAX_PAGE_SIZE / list_threshold` documents per
+    due one, so it never costs much more than requesting them one by one,
+    and `list_limit` caps documents scanned per round. Other documents,
+    including those without `created_at` or missing from the listing, are
+    requested one by one. Document which can't be checked is backed off
+    for `max_interval` (last error is kept in `error`), and deleted one
+    (404) is finished as `{'id': ..., 'status': 'error'}`. With
+    `polling=False` statuses come only through `notify()`, e.g. from
+    attached `WebhookReceiver`.
+
+    Finished (`done` or `error`) documents are passed to callbacks and
+    yielded by `wait()`:
+
+        watcher = DocumentWatcher(api)
+        for path, doc in api.create_documents(paths):
+            watcher.add(doc)
+        for doc in watcher.wait():
+            ...
+    """
+
+    def __init__(self,
+                 api,
+                 min_interval=1.0,
+                 max_interval=30.0,
+                 backoff=0.25,
+                 list_threshold=5,
+                 list_limit=2000,
+                 cluster_gap=60.0,
+                 callback=None,
+                 polling=True,
+                 clock=monotonic):
+        self.api = api
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.list_threshold = list_threshold
+        self.list_limit = list_limit
+        self.cluster_gap = cluster_gap
+        self.callback = callback
+        self.polling = polling
+        self.clock = clock
+        self.pending = {}
+        self.error = None
+        self.completed = collections.deque()
+        self.condition = threading.Condition()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, document, callback=None):
+        """
+        Starts watching document. `document` is id, document dict or
+        `boxview.models.Document` (e.g. result of `create_document`).
+        """
+        is_document = isinstance(document, (dict, Model))
+        if is_document:
+            document_id = document['id']
+            created_at = document.get('created_at')
+        else:
+            document_id, created_at = document, None
+
+        with self.condition:
+            self.pending[document_id] = _Pending(
+                document_id, created_at, self.clock(), callback)
+
+        if is_document and 'status' in document:
+            self.notify(document)
+
+    def remove(self, document_id):
+        with self.condition:
+            self.pending.pop(document_id, None)
+
+    def notify(self, document):
+        """
+        Updates status of watched document from fresh document dict.
+        Returns `True` if document is finished.
+        """
+        with self.condition:
+            pending = self.pending.get(document['id'])
+            if pending is None:
+                return False
+            if document['status'] not in (DONE, ERROR):
+                pending.status = document['status']
+                pending.created_at = (pending.created_at or
+                                      document.get('created_at'))
+                return False
+            del self.pending[pending.id]
+            self.completed.append(document)
+            self.condition.notify_all()
+
+        for callback in (pending.callback, self.callback):
+            if callback is not None:
+                callback(document)
+        return True
+
+    def _schedule(self, pending, now):
+        interval = (now - pending.added) * self.backoff
+        interval = max(self.min_interval, min(self.max_interval, interval))
+        pending.next_poll = now + interval
+
+    def _clusters(self, due):
+        """ Groups due documents by gaps in their `created_at`. """
+        dated = sorted((parse_date(p.created_at), p.id)
+                       for p in due if p.created_at)
+        cluster = []
+        for created, document_id in dated:
+            if cluster and ((created - cluster[-1][0]).total_seconds() >
+                            self.cluster_gap):
+                yield cluster
+                cluster = []
+            cluster.append((created, document_id))
+        if cluster:
+            yield cluster
+
+    def _list(self, due, finished, seen):
+        budget = self.list_limit
+        for cluster in self._clusters(due):
+            if len(cluster) < self.list_threshold or budget <= 0:
+                continue
+            # listing is cheaper while a page holds `list_threshold` of them
+            limit = min(budget,
+                        len(cluster) * MAX_PAGE_SIZE // self.list_threshold)
+            documents = self.api.iter_documents(
+                page_size=MAX_PAGE_SIZE,
+                created_before=cluster[-1][0] + datetime.timedelta(seconds=1),
+                created_after=cluster[0][0] - datetime.timedelta(seconds=1),
+                prefetch=False)
+
+            wanted = set(document_id for _, document_id in cluster)
+            for document in itertools.islice(documents, limit):
+                budget -= 1
+                seen.add(document['id'])
+                if self.notify(document):
+                    finished.append(document)
+                if wanted <= seen:
+                    break
+
+    def poll(self):
+        """
+        Checks documents whose poll time has come. Returns list of
+        documents finished during this round.
+        """
+        now = self.clock()
+        with self.condition:
+            due = [p for p in self.pending.values() if p.next_poll <= now]
+
+        finished, seen, listed = [], set(), True
+        if len(due) >= self.list_threshold:
+            try:
+                self._list(due, finished, seen)
+            except BoxViewError as e:
+                self.error, listed = e, False
+
+        for pending in due:
+            self._schedule(pending, now)
+            if pending.id in seen:
+                continue
+            if not listed:
+                pending.next_poll = now + self.max_interval
+                continue
+            try:
+                document = self.api.get_document(pending.id)
+            except BoxViewError as e:
+                self.error = e
+                if e.response is not None and e.response.status_code == 404:
+                    document = {'id': pending.id, 'status': ERROR}
+                else:
+                    pending.next_poll = now + self.max_interval
+                    continue
+            if self.notify(document):
+                finished.append(document)
+
+        return finished
+
+    def next_poll(self):
+        with self.condition:
+            if not self.pending:
+                return None
+            return min(p.next_poll for p in self.pending.values())
+
+    def wait(self, timeout=None):
+        """
+        Yields documents as they finish, till nothing is pending or
+        `timeout` seconds passed.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            while self.completed:
+                yield self.completed.popleft()
+
+            next_poll = self.next_poll()
+            if next_poll is None:
+                return
+
+            now = self.clock()
+            if deadline is not None and now >= deadline:
+                return
+
+            if not self.polling:
+                delay = None
+            elif next_poll <= now:
+                self.poll()
+                continue
+            else:
+                delay = next_poll - now
+
+            if deadline is not None:
+                remaining = deadline - now
+                delay = remaining if delay is None else min(delay, remaining)
+            with self.condition:
+                if not self.completed:
+                    self.condition.wait(delay)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import json
+import collections
+
+from .boxview import DONE, ERROR
+
+__all__ = ['WebhookEvent', 'WebhookReceiver']
+
+VIEWABLE, DOCUMENT_DONE, DOCUMENT_ERROR = (
+    'document.viewable', 'document.done', 'document.error')
+
+EVENT_STATUSES = {
+    DOCUMENT_DONE: DONE,
+    DOCUMENT_ERROR: ERROR,
+}
+
+
+class WebhookEvent(collections.namedtuple(
+        'WebhookEvent', ['type', 'document_id', 'created_at', 'data'])):
+
+    @property
+    def status(self):
+        """ Document status implied by event, `None` for `viewable`. """
+        return EVENT_STATUSES.get(self.type)
+
+    def to_document(self):
+        document = dict(self.data, id=self.document_id)
+        if self.status:
+            document['status'] = self.status
+        return document
+
+
+class WebhookReceiver(object):
+    """
+    Consumes Box View webhook notifications (see `BoxView.create_webhook`).
+    Receiver is WSGI application itself; `boxview.aio.asgi_webhook` wraps
+    it for ASGI servers. Events are passed to subscribed handlers, put to
+    `queue` and fed to attached `DocumentWatcher`s, so the watcher can
+    work without polling.
+    """
+
+    def __init__(self, queue=None):
+        self.queue = queue
+        self.handlers = []
+
+    def subscribe(self, handler, event_type=None):
+        """ Calls `handler(event)` for `event_type` events (all if None). """
+        self.handlers.append((event_type, handler))
+
+    def attach(self, watcher):
+        def _notify(event):
+            if event.status:
+                watcher.notify(event.to_document())
+        self.subscribe(_notify)
+
+    def parse(self, body):
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        payload = json.loads(body)
+        if isinstance(payload, dict):
+            payload = [payload]
+
+        events = []
+        for item in payload:
+            data = item.get('data') or {}
+            events.append(WebhookEvent(item['type'],
+                                       data.get('id'),
+                                       item.get('created_at'),
+                                       data))
+        return events
+
+    def dispatch(self, body):
+        events = self.parse(body)
+        self._publish(events)
+        return events
+
+    def _publish(self, events):
+        for event in events:
+            if self.queue is not None:
+                self.queue.put(event)
+            for event_type, handler in self.handlers:
+                if event_type is None or event_type == event.type:
+                    handler(event)
+
+    def handle(self, method, body):
+        """ Returns `(status, body)` for HTTP request to webhook url. """
+        if method != 'POST':
+            return '405 Method Not Allowed', b''
+        try:
+            events = self.parse(body)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return '400 Bad Request', b''
+        self._publish(events)
+        return '200 OK', b''
+
+    def __call__(self, environ, start_response):
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        body = environ['wsgi.input'].read(length) if length else b''
+
+        status, content = self.handle(environ['REQUEST_METHOD'], body)
+        start_response(status, [('Content-Type', 'text/plain'),
+                                ('Content-Length', str(len(content)))])
+        return [content]
@@ -28,7 +28,13 @@ setup(
     packages=find_packages(),
     package_data={'': ['LICENSE']},
     include_package_data=True,
-    install_requires=['requests', 'six'],
+    install_requires=['requests', 'six', 'futures; python_version < "3"'],
+    extras_require={
+        'async': ['aiohttp'],
+    },
+    entry_points={
+        'console_scripts': ['boxview = boxview.cli:main'],
+    },
     license='MIT',
     zip_safe=False,
     classifiers=[
@@ -2,16 +2,48 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 import six
 import json
+import zlib
+import time
+import shutil
 import datetime
+import subprocess
+import threading
+import tempfile
 import unittest
+import urllib3
+import warnings
 from mock import patch
 from urlparse import urljoin
+from requests.exceptions import ConnectionError, Timeout
 from requests.models import Response
 from requests.sessions import Session
 from boxview.boxview import BoxView, BoxViewError, RetryAfter, API_URL
-from boxview.utils import format_date, get_mimetype_from_headers
+from boxview.cache import FileCache, MetadataCache
+from boxview.cli import main as cli_main
+from boxview.dedup import DedupIndex
+from boxview.metrics import Instrument, Histogram, MetricsCollector
+from boxview.models import Document, DocumentPage, DONE
+from boxview.models import Session as BoxViewSession
+from boxview.multipart import MultipartEncoder
+from boxview.ratelimit import RateLimiter
+from boxview.retry import RetryPolicy
+from boxview.sessionpool import SessionPool
+from boxview.sse import EventParser
+from boxview.watcher import DocumentWatcher
+from boxview.webhook import WebhookReceiver
+from boxview import utils
+from boxview.utils import (
+    format_date, get_mimetype_from_headers, default_session
+)
+
+try:
+    import asyncio
+    from boxview.aio import AsyncBoxView, asgi_webhook
+except (ImportError, SyntaxError):
+    AsyncBoxView = None
 
 
 TEST_URL = 'https://cloud.box.com/shared/static/4qhegqxubg8ox0uj5ys8.pdf'
@@ -77,6 +109,92 @@ class BoxViewTestCase(unittest.TestCase):
         headers = {'Content-Type': 'text/plain; charset=utf-8'}
         self.assertEqual('text/plain', get_mimetype_from_headers(headers))
 
+    def test_lazy_imports(self):
+        script = ('import sys, boxview\n'
+                  'boxview.BoxView.get_session_url("x")\n'
+                  'boxview.BoxView("<box view api key>")\n'
+                  'print(",".join(m for m in ("requests", "urllib3", "cgi")\n'
+                  '               if m in sys.modules))')
+        output = subprocess.check_output(
+            [sys.executable, '-c', script],
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(output.strip(), six.b(''))
+
+    def test_pool_options(self):
+        upload_url = 'https://upload.view-api.box.com/'
+        session = default_session(pool_maxsize=32,
+                                  pool_block=True,
+                                  hosts={upload_url: {'pool_maxsize': 4}})
+        self.assertEqual(session.get_adapter(API_URL)._pool_maxsize, 32)
+        self.assertEqual(session.get_adapter(upload_url)._pool_maxsize, 4)
+        self.assertTrue(session.get_adapter(upload_url)._pool_block)
+
+        api = BoxView('<box view api key>', session=session)
+        adapter = session.get_adapter(API_URL)
+        adapter.poolmanager.connection_from_url(API_URL)
+        stats = api.pool_stats()['https://view-api.box.com:443']
+        self.assertEqual(stats['maxsize'], 32)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['created'], 0)
+
+    def test_session_per_process(self):
+        api = BoxView('<box view api key>')
+        session = api.session
+        self.assertIs(api.session, session)
+        self.assertIn('Authorization', session.headers)
+
+        with patch('boxview.utils.os.getpid', return_value=-1):
+            forked = api.session
+        self.assertIsNot(forked, session)
+        self.assertEqual(forked.headers, session.headers)
+
+    def test_session_after_fork(self):
+        with patch('boxview.utils.os.register_at_fork', create=True) as hook:
+            api = BoxView('<box view api key>', transport='urllib3')
+        self.assertFalse(hook.called)
+        self.assertIn(api.sessions, utils._providers)
+
+        session = api.session
+        utils._reset_providers()  # registered to run in forked child
+        self.assertIsNot(api.session, session)
+
+    def test_session_per_thread(self):
+        api = BoxView('<box view api key>', per_thread_session=True)
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(api.session))
+        thread.start()
+        thread.join()
+        self.assertIs(api.session, api.session)
+        self.assertIsNot(api.session, sessions[0])
+
+        api = BoxView('<box view api key>', session=Session)
+        self.assertIsInstance(api.session, Session)
+        self.assertIn('Authorization', api.session.headers)
+
+    @patch.object(urllib3.PoolManager, 'urlopen')
+    def test_urllib3_transport(self, mock_urlopen):
+        def _response(status, content):
+            return urllib3.HTTPResponse(
+                body=six.BytesIO(six.b(json.dumps(content))),
+                headers={'Content-Type': 'application/json'},
+                status=status,
+                preload_content=False)
+
+        api = BoxView('<box view api key>', transport='urllib3')
+        mock_urlopen.return_value = _response(200, TEST_DOCUMENT_LIST)
+        result = api.get_documents(limit=10)
+        self.assertEqual(result, TEST_DOCUMENT_LIST)
+        args, kwargs = mock_urlopen.call_args
+        self.assertEqual(args, ('GET', urljoin(API_URL, 'documents?limit=10')))
+        self.assertIn('Authorization', kwargs['headers'])
+        self.assertFalse(mock_urlopen.return_value.data)  # body was read
+
+        mock_urlopen.return_value = _response(404, {'message': 'Not found'})
+        self.assertRaises(BoxViewError, api.get_document, 'missing')
+
+        self.assertRaises(ValueError, BoxView, '<box view api key>',
+                          transport='curl')
+
     @patch.object(Session, 'request')
     def test_crate_document_from_url(self, mock_request):
         response = Response()
@@ -122,6 +240,98 @@ class BoxViewTestCase(unittest.TestCase):
                                                     name='Test Document')
         self.assertEqual(result, TEST_DOCUMENT)
 
+    @patch.object(Session, 'request')
+    def test_create_documents(self, mock_request):
+        def _request(method, url, **kwargs):
+            data = kwargs.get('data')
+            response = Response()
+            if isinstance(data, six.string_types) and 'broken' in data:
+                response.status_code = 400
+                response.reason = 'Bad Request'
+            else:
+                response.status_code = 201
+                response._content = json.dumps(TEST_DOCUMENT)
+            return response
+        mock_request.side_effect = _request
+
+        items = [TEST_URL, six.BytesIO(), __file__, 'http://broken.pdf']
+        results = dict(self.api.create_documents(items, max_workers=2))
+        self.assertEqual(len(results), len(items))
+        self.assertEqual(results[TEST_URL], TEST_DOCUMENT)
+        self.assertEqual(results[__file__], TEST_DOCUMENT)
+        self.assertIsInstance(results['http://broken.pdf'], BoxViewError)
+
+    @patch.object(Session, 'request')
+    def test_create_document_from_file_streamed(self, mock_request):
+        def _request(method, url, data=None, headers=None, **kwargs):
+            sent.append(data.read(100))
+            data.seek(0)
+            while True:
+                chunk = data.read(7)
+                if not chunk:
+                    break
+                sent.append(chunk)
+            response = Response()
+            response.status_code = 201
+            response._content = json.dumps(TEST_DOCUMENT)
+            return response
+        mock_request.side_effect = _request
+
+        with open(__file__, 'rb') as fp:
+            content = fp.read()
+        for file in (__file__, six.BytesIO(content)):
+            sent, progress = [], []
+            result = self.api.create_document_from_file(
+                file, progress=lambda *args: progress.append(args),
+                name='Test Document')
+            self.assertEqual(result, TEST_DOCUMENT)
+
+            body = six.b('').join(sent[1:])
+            headers = mock_request.call_args[1]['headers']
+            boundary = six.b(headers['Content-Type'].split('boundary=')[1])
+            self.assertTrue(body.startswith(six.b('--') + boundary))
+            self.assertTrue(six.b('name="name"\r\n\r\nTest Document\r\n')
+                            in body)
+            self.assertTrue(content in body)
+            self.assertTrue(body.endswith(boundary + six.b('--\r\n')))
+            self.assertEqual(progress[-1], (len(body), len(body)))
+            self.assertEqual(mock_request.call_args[1]['data'].length,
+                             len(body))
+
+    def test_multipart_filename(self):
+        body = MultipartEncoder({}, six.BytesIO(),
+                                filename='a"b\\c\r\nd.pdf')
+        self.assertTrue(six.b('; filename="a%22b\\\\c%0D%0Ad.pdf"\r\n')
+                        in body.head)
+
+    @patch.object(Session, 'request')
+    def test_create_document_from_file_dedup(self, mock_request):
+        status = ['done']
+
+        def _request(method, url, **kwargs):
+            response = Response()
+            response.status_code = 201 if method == 'POST' else 200
+            document = dict(TEST_DOCUMENT, status=status[0])
+            response._content = json.dumps(document)
+            return response
+        mock_request.side_effect = _request
+
+        dedup = DedupIndex(':memory:')
+        api = BoxView('<box view api key>', dedup=dedup)
+        for _ in range(2):
+            api.create_document_from_file(six.BytesIO(six.b('test')))
+        methods = [args[0] for args, kwargs in mock_request.call_args_list]
+        self.assertEqual(methods, ['POST', 'GET'])
+
+        # failed conversion is uploaded again
+        status[0] = 'error'
+        api.create_document_from_file(six.BytesIO(six.b('test')))
+        self.assertEqual(mock_request.call_count, 4)
+
+        api.delete_document(TEST_DOCUMENT['id'])
+        api.create_document_from_file(six.BytesIO(six.b('test')))
+        self.assertEqual(mock_request.call_args[0][0], 'POST')
+
     @patch.object(Session, 'request')
     def test_get_document(self, mock_request):
         response = Response()
@@ -145,6 +355,263 @@ class BoxViewTestCase(unittest.TestCase):
         self.assertIsNotNone(result)
         self.assertEqual(result, TEST_DOCUMENT_LIST)
 
+    @patch.object(Session, 'request')
+    def test_models(self, mock_request):
+        loads = []
+
+        def _json_loads(content):
+            loads.append(content)
+            return json.loads(content)
+
+        def _request(method, url, **kwargs):
+            response = Response()
+            response.status_code = 200
+            if url.endswith('sessions'):
+                response._content = json.dumps(TEST_SESSION)
+            elif url.endswith('documents'):
+                response._content = json.dumps(TEST_DOCUMENT_LIST)
+            else:
+                response._content = json.dumps(TEST_DOCUMENT)
+            return response
+        mock_request.side_effect = _request
+
+        api = BoxView('<box view api key>', models=True,
+                      json_loads=_json_loads)
+
+        document = api.get_document(TEST_DOCUMENT['id'])
+        self.assertIsInstance(document, Document)
+        self.assertFalse(hasattr(document, '__dict__'))
+        self.assertIs(document.status, DONE)
+        self.assertEqual(document.created_at,
+                         datetime.datetime(2013, 8, 30, 0, 17, 37))
+        self.assertEqual(document['created_at'], TEST_DOCUMENT['created_at'])
+        self.assertEqual(document, TEST_DOCUMENT)
+        self.assertEqual(document.to_dict(), TEST_DOCUMENT)
+
+        page = api.get_documents()
+        self.assertIsInstance(page, DocumentPage)
+        self.assertEqual(page.total_count, 1)
+        self.assertEqual([d.id for d in page], [TEST_DOCUMENT['id']])
+        self.assertEqual(page.to_dict(), TEST_DOCUMENT_LIST)
+        self.assertEqual([d.name for d in api.iter_documents()],
+                         [TEST_DOCUMENT['name']])
+
+        session = api.create_session(TEST_DOCUMENT['id'])
+        self.assertIsInstance(session, BoxViewSession)
+        self.assertEqual(session.expires_at.year, 3915)
+        self.assertEqual(session.urls, TEST_SESSION['urls'])
+        self.assertEqual(len(loads), 4)
+
+    def test_model_missing_fields(self):
+        document = Document({'id': TEST_DOCUMENT['id'], 'pages': 3})
+        self.assertIsNone(document.name)
+        self.assertIsNone(document.created_at)
+        self.assertNotIn('name', document)
+        self.assertRaises(KeyError, lambda: document['name'])
+        self.assertEqual(document.get('name', ''), '')
+        self.assertEqual(document['pages'], 3)
+        self.assertEqual(document.to_dict(), {
+            'type': 'document', 'id': TEST_DOCUMENT['id'], 'pages': 3})
+
+    @patch.object(Session, 'request')
+    def test_iter_documents(self, mock_request):
+        documents = [
+            dict(TEST_DOCUMENT, id=str(i), created_at=created_at)
+            for i, created_at in enumerate([
+                '2013-08-30T00:17:40Z',
+                '2013-08-30T00:17:39Z',
+                '2013-08-30T00:17:38Z',
+                '2013-08-30T00:17:38Z',
+                '2013-08-30T00:17:37Z',
+            ])
+        ]
+
+        def _request(method, url, params=None, **kwargs):
+            entries = [doc for doc in documents
+                       if 'created_before' not in params or compare(
+                           doc['created_at'][:19],
+                           params['created_before'][:19])]
+            content = {'document_collection': {
+                'total_count': len(documents),
+                'entries': entries[:params['limit']]}}
+            response = Response()
+            response.status_code = 200
+            response._content = json.dumps(content)
+            return response
+        mock_request.side_effect = _request
+
+        # pager can't know if API compares `created_before` inclusively
+        for compare in (lambda a, b: a <= b, lambda a, b: a < b):
+            for page_size, prefetch in ((2, True), (2, False), (3, True)):
+                result = self.api.iter_documents(page_size=page_size,
+                                                 prefetch=prefetch)
+                self.assertEqual([doc['id'] for doc in result],
+                                 ['0', '1', '2', '3', '4'])
+
+    @patch.object(Session, 'request')
+    def test_iter_documents_same_second(self, mock_request):
+        def _request(method, url, params=None, **kwargs):
+            if method == 'DELETE':
+                response = Response()
+                response.status_code = 204
+                return response
+            entries = [doc for doc in documents
+                       if compare(doc['created_at'][:19],
+                                  params['created_before'][:19])]
+            content = {'document_collection': {
+                'total_count': len(documents),
+                'entries': entries[:params['limit']]}}
+            response = Response()
+            response.status_code = 200
+            response._content = json.dumps(content)
+            return response
+        mock_request.side_effect = _request
+
+        for compare in (lambda a, b: a <= b, lambda a, b: a < b):
+            documents = [dict(TEST_DOCUMENT, id=str(i)) for i in range(60)]
+            documents.append(dict(TEST_DOCUMENT, id='older',
+                                  created_at='2013-08-30T00:17:36Z'))
+
+            skipped = []
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                result = list(self.api.iter_documents(
+                    created_before='2013-08-30T00:17:40Z',
+                    on_skip=skipped.append))
+            self.assertEqual(len(result), 51)
+            self.assertEqual(result[-1]['id'], 'older')
+            self.assertEqual(skipped, [TEST_DOCUMENT['created_at']])
+            self.assertEqual(caught[0].category, RuntimeWarning)
+
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                report = self.api.purge_documents('2013-08-30T00:17:40Z')
+            self.assertEqual((report.deleted, report.skipped), (51, 1))
+            self.assertEqual(report.to_dict()['skipped'], 1)
+
+    @patch.object(Session, 'request')
+    def test_purge_documents(self, mock_request):
+        documents = [
+            dict(TEST_DOCUMENT, id=str(i),
+                 created_at='2013-08-30T00:17:{}Z'.format(40 - i))
+            for i in range(6)
+        ]
+        broken = set(['3'])
+        listed_before = []
+
+        def _request(method, url, params=None, **kwargs):
+            response = Response()
+            document_id = url.rsplit('/', 1)[-1]
+            if method == 'DELETE':
+                if document_id in broken:
+                    response.status_code = 500
+                else:
+                    documents.remove([doc for doc in documents
+                                      if doc['id'] == document_id][0])
+                    response.status_code = 204
+                return response
+            listed_before.append(params['created_before'])
+            entries = [doc for doc in documents
+                       if doc['created_at'][:19] <=
+                       params['created_before'][:19]]
+            content = {'document_collection': {
+                'total_count': len(documents),
+                'entries': entries[:params['limit']]}}
+            response.status_code = 200
+            response._content = json.dumps(content)
+            return response
+        mock_request.side_effect = _request
+
+        created_before = '2013-08-30T00:17:39Z'
+        report = self.api.purge_documents(created_before, dry_run=True)
+        self.assertEqual((report.listed, report.deleted), (5, 0))
+        self.assertEqual(report.to_dict()['would_delete'], 5)
+        self.assertEqual(len(documents), 6)
+
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'purge.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(checkpoint))
+
+        def _progress(report):
+            if report.deleted == 1:
+                raise KeyboardInterrupt()
+        self.assertRaises(KeyboardInterrupt, self.api.purge_documents,
+                          created_before, max_workers=1,
+                          checkpoint=checkpoint, progress=_progress)
+        self.assertTrue(os.path.exists(checkpoint))
+
+        del listed_before[:]
+        report = self.api.purge_documents(created_before,
+                                          checkpoint=checkpoint)
+        self.assertEqual(listed_before[0], '2013-08-30T00:17:39Z')
+        self.assertEqual((report.deleted, report.failed), (4, 1))
+        self.assertEqual(report.errors[0][0], '3')
+        self.assertFalse(os.path.exists(checkpoint))
+        self.assertEqual([doc['id'] for doc in documents], ['0', '3'])
+
+        # failed document doesn't hold checkpoint back, it's kept there and
+        # deleted after resume
+        documents.extend(
+            dict(TEST_DOCUMENT, id=str(i),
+                 created_at='2013-08-30T00:17:{}Z'.format(40 - i))
+            for i in (4, 5))
+
+        def _progress(report):
+            if report.failed and report.deleted:
+                raise KeyboardInterrupt()
+        self.assertRaises(KeyboardInterrupt, self.api.purge_documents,
+                          created_before, max_workers=1,
+                          checkpoint=checkpoint, progress=_progress)
+        with open(checkpoint) as fp:
+            state = json.load(fp)
+        self.assertEqual(state['failed'], ['3'])
+        self.assertLessEqual(state['created_before'], '2013-08-30T00:17:37Z')
+
+        broken.clear()
+        report = self.api.purge_documents(created_before,
+                                          checkpoint=checkpoint)
+        self.assertEqual(report.failed, 0)
+        self.assertEqual([doc['id'] for doc in documents], ['0'])
+
+    @patch.object(Session, 'request')
+    def test_purge_documents_resume(self, mock_request):
+        documents = [dict(TEST_DOCUMENT, id=str(i)) for i in range(3)]
+
+        def _request(method, url, params=None, **kwargs):
+            response = Response()
+            if method == 'DELETE':
+                document_id = url.rsplit('/', 1)[-1]
+                documents.remove([doc for doc in documents
+                                  if doc['id'] == document_id][0])
+                response.status_code = 204
+                return response
+            # `created_before` is exclusive
+            entries = [doc for doc in documents
+                       if doc['created_at'][:19] <
+                       params['created_before'][:19]]
+            content = {'document_collection': {
+                'total_count': len(documents),
+                'entries': entries[:params['limit']]}}
+            response.status_code = 200
+            response._content = json.dumps(content)
+            return response
+        mock_request.side_effect = _request
+
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'purge.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(checkpoint))
+
+        def _progress(report):
+            raise KeyboardInterrupt()
+        self.assertRaises(KeyboardInterrupt, self.api.purge_documents,
+                          '2013-08-30T00:17:40Z', max_workers=1,
+                          checkpoint=checkpoint, progress=_progress)
+        self.assertEqual(len(documents), 2)
+
+        # the rest of documents created at the same second is listed
+        report = self.api.purge_documents('2013-08-30T00:17:40Z',
+                                          checkpoint=checkpoint)
+        self.assertEqual(report.deleted, 3)
+        self.assertEqual(documents, [])
+
     @patch.object(Session, 'request')
     def test_update_document(self, mock_request):
         response = Response()
@@ -233,6 +700,116 @@ class BoxViewTestCase(unittest.TestCase):
         except OSError:
             pass
 
+    def _serve_range(self, content, etag='"v1"', gzip=None):
+        """
+        With `gzip='negotiated'` whole content is gzipped unless identity is
+        asked for; with `gzip='always'` it is gzipped anyway.
+        """
+        def _request(method, url, headers=None, **kwargs):
+            headers = headers or {}
+            response = Response()
+            response.headers['Content-Type'] = 'application/pdf'
+            response.headers['Accept-Ranges'] = 'bytes'
+            response.headers['ETag'] = etag
+            if gzip == 'always' or (gzip == 'negotiated' and
+                                    headers.get('Accept-Encoding') !=
+                                    'identity'):
+                body = zlib.compress(content)
+                response.status_code = 200
+                response.headers['Content-Encoding'] = 'deflate'
+                response.headers['Content-Length'] = str(len(body))
+                response.raw = urllib3.HTTPResponse(
+                    body=six.BytesIO(body if method == 'GET' else six.b('')),
+                    headers=response.headers,
+                    preload_content=False)
+                return response
+            body = content
+            if 'Range' in headers and headers.get('If-Range') in (None, etag):
+                start, end = headers['Range'][6:].split('-')
+                end = int(end) if end else len(content) - 1
+                body = content[int(start):end + 1]
+                response.status_code = 206
+                response.headers['Content-Range'] = 'bytes {}-{}/{}'.format(
+                    start, end, len(content))
+            else:
+                response.status_code = 200
+            response.headers['Content-Length'] = str(len(body))
+            response.raw = six.BytesIO(body if method == 'GET' else six.b(''))
+            return response
+        return _request
+
+    @patch.object(Session, 'request')
+    def test_get_document_content_to_file_resume(self, mock_request):
+        content = six.b('0123456789') * 100
+        mock_request.side_effect = self._serve_range(content)
+        filename = 'boxview.pdf'
+        state_filename = filename + '.boxview-partial'
+        try:
+            with open(filename, 'wb') as fp:
+                fp.write(content[:300])
+            with open(state_filename, 'w') as fp:
+                json.dump({'etag': '"v1"', 'length': len(content)}, fp)
+
+            mimetype = self.api.get_document_content_to_file(
+                filename, TEST_DOCUMENT['id'], resume=True)
+            self.assertEqual(mimetype, 'application/pdf')
+            headers = mock_request.call_args[1]['headers']
+            self.assertEqual(headers['Range'], 'bytes=300-')
+            with open(filename, 'rb') as fp:
+                self.assertEqual(fp.read(), content)
+            self.assertFalse(os.path.exists(state_filename))
+
+            # content has changed, so it is downloaded from scratch
+            with open(filename, 'wb') as fp:
+                fp.write(six.b('old'))
+            with open(state_filename, 'w') as fp:
+                json.dump({'etag': '"v0"', 'length': len(content)}, fp)
+            self.api.get_document_content_to_file(
+                filename, TEST_DOCUMENT['id'], resume=True)
+            with open(filename, 'rb') as fp:
+                self.assertEqual(fp.read(), content)
+        finally:
+            for name in (filename, state_filename):
+                if os.path.exists(name):
+                    os.remove(name)
+
+    @patch.object(Session, 'request')
+    def test_get_document_content_to_file_encoded(self, mock_request):
+        content = six.b('0123456789') * 1000
+        filename = 'boxview.pdf'
+        state_filename = filename + '.boxview-partial'
+        try:
+            for gzip in ('negotiated', 'always'):
+                mock_request.side_effect = self._serve_range(content,
+                                                             gzip=gzip)
+                for kwargs in ({'resume': True}, {'parts': 3}):
+                    self.api.get_document_content_to_file(
+                        filename, TEST_DOCUMENT['id'], **kwargs)
+                    headers = mock_request.call_args[1]['headers']
+                    self.assertEqual(headers['Accept-Encoding'], 'identity')
+                    with open(filename, 'rb') as fp:
+                        self.assertEqual(fp.read(), content)
+                    self.assertFalse(os.path.exists(state_filename))
+        finally:
+            for name in (filename, state_filename):
+                if os.path.exists(name):
+                    os.remove(name)
+
+    @patch.object(Session, 'request')
+    def test_get_document_content_to_file_parts(self, mock_request):
+        content = six.b('0123456789') * 100
+        mock_request.side_effect = self._serve_range(content)
+        filename = 'boxview.pdf'
+        try:
+            mimetype = self.api.get_document_content_to_file(
+                filename, TEST_DOCUMENT['id'], parts=3)
+            self.assertEqual(mimetype, 'application/pdf')
+            self.assertEqual(mock_request.call_count, 4)
+            with open(filename, 'rb') as fp:
+                self.assertEqual(fp.read(), content)
+        finally:
+            os.remove(filename)
+
     @patch.object(Session, 'request')
     def test_get_document_content_mimetype(self, mock_request):
         response = Response()
@@ -315,6 +892,75 @@ class BoxViewTestCase(unittest.TestCase):
         else:
             self.assertTrue(False)
 
+    @patch.object(Session, 'request')
+    def test_request_rate_limited(self, mock_request):
+        response = Response()
+        response.status_code = 429
+        response.headers['Retry-After'] = '30'
+        mock_request.return_value = response
+
+        api = BoxView('<box view api key>', rate_limit=10)
+        self.assertRaises(RetryAfter, api.get_document, TEST_DOCUMENT['id'])
+        self.assertTrue(api.rate_limiter.reserve() > 29)
+
+        # thumbnail which is not ready yet doesn't pause client
+        response.status_code = 202
+        api = BoxView('<box view api key>', rate_limit=10)
+        self.assertRaises(RetryAfter, api.get_thumbnail_to_string,
+                          TEST_DOCUMENT['id'], 100, 100)
+        self.assertEqual(api.rate_limiter.reserve(), 0)
+
+    @patch.object(Session, 'request')
+    def test_request_retry(self, mock_request):
+        unavailable = Response()
+        unavailable.status_code = 503
+        unavailable.raw = six.BytesIO()
+        throttled = Response()
+        throttled.status_code = 429
+        throttled.headers['Retry-After'] = '5'
+        throttled.raw = six.BytesIO()
+        response = Response()
+        response.status_code = 200
+        response._content = json.dumps(TEST_DOCUMENT)
+        mock_request.side_effect = [unavailable, throttled, response]
+
+        slept = []
+        retry = RetryPolicy(max_attempts=3, backoff_base=1, jitter=False,
+                            sleep=slept.append)
+        api = BoxView('<box view api key>', retry=retry)
+        response = api.request('GET', 'documents')
+        self.assertEqual(slept, [1, 5])
+        self.assertEqual(response.attempts, 3)
+        self.assertEqual(response.retry_time, 6)
+
+        mock_request.side_effect = [unavailable, unavailable, unavailable]
+        try:
+            api.get_document(TEST_DOCUMENT['id'])
+        except BoxViewError as e:
+            self.assertEqual(e.attempts, 3)
+        else:
+            self.assertTrue(False)
+
+        # not retryable status
+        unauthorized = Response()
+        unauthorized.status_code = 401
+        mock_request.side_effect = [unauthorized]
+        self.assertRaises(BoxViewError, api.get_document, TEST_DOCUMENT['id'])
+
+        # 5xx of not idempotent request isn't retried, throttling is
+        mock_request.side_effect = [unavailable, throttled, response]
+        self.assertRaises(BoxViewError, api.create_session, 'id')
+        mock_request.side_effect = [throttled, response]
+        self.assertEqual(api.request('POST', 'sessions').attempts, 2)
+        retry.retry_methods = None
+        mock_request.side_effect = [unavailable, response]
+        self.assertEqual(api.request('POST', 'sessions').attempts, 2)
+
+        # deadline is exceeded
+        retry.deadline = 3
+        mock_request.side_effect = [throttled]
+        self.assertRaises(RetryAfter, api.get_document, TEST_DOCUMENT['id'])
+
     @patch.object(Session, 'request')
     def test_get_thumbnail(self, mock_request):
         response = Response()
@@ -329,6 +975,39 @@ class BoxViewTestCase(unittest.TestCase):
         self.assertEqual(stream.getvalue(), response._content)
         self.assertEqual(mimetype, response.headers['Content-Type'])
 
+    @patch.object(Session, 'request')
+    def test_get_thumbnail_streamed(self, mock_request):
+        content = six.b('0123456789') * 10
+        for encoding in ('identity', 'gzip'):
+            response = Response()
+            response.status_code = 200
+            response.headers['Content-Type'] = 'image/png'
+            response.headers['Content-Encoding'] = encoding
+            response.raw = six.BytesIO(content)
+            mock_request.return_value = response
+
+            stream = six.BytesIO()
+            self.api.get_thumbnail(stream, TEST_DOCUMENT['id'], 100, 100,
+                                   chunk_size=7)
+            self.assertEqual(stream.getvalue(), content)
+            self.assertTrue(mock_request.call_args[1]['stream'])
+
+    @patch('boxview.boxview.copy_response')
+    @patch.object(Session, 'request')
+    def test_get_to_string_chunk_size(self, mock_request, mock_copy):
+        response = Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'image/png'
+        response.raw = six.BytesIO()
+        mock_request.return_value = response
+
+        self.api.get_thumbnail_to_string(TEST_DOCUMENT['id'], 100, 100,
+                                         chunk_size=7)
+        self.assertEqual(mock_copy.call_args[0][2], 7)
+        self.api.get_document_content_to_string(TEST_DOCUMENT['id'],
+                                                chunk_size=9)
+        self.assertEqual(mock_copy.call_args[0][2], 9)
+
     @patch.object(Session, 'request')
     def test_get_thumbnail_to_string(self, mock_request):
         response = Response()
@@ -344,6 +1023,35 @@ class BoxViewTestCase(unittest.TestCase):
         self.assertEqual(result, response._content)
         self.assertEqual(mimetype, response.headers['Content-Type'])
 
+    @patch.object(Session, 'request')
+    def test_get_thumbnails(self, mock_request):
+        not_ready = set(['b'])
+
+        def _request(method, url, **kwargs):
+            document_id = url.split('/')[-2]
+            response = Response()
+            if document_id in not_ready:
+                not_ready.remove(document_id)
+                response.status_code = 202
+                response.headers['Retry-After'] = '0'
+                response.raw = six.BytesIO()
+            elif document_id == 'c':
+                response.status_code = 404
+                response.reason = 'Not Found'
+            else:
+                response.status_code = 200
+                response.headers['Content-Type'] = 'image/png'
+                response.raw = six.BytesIO(six.b(document_id))
+            return response
+        mock_request.side_effect = _request
+
+        items = [('a', 100, 100), ('b', 100, 100), ('c', 100, 100)]
+        results = dict((item, (content, mimetype)) for item, content, mimetype
+                       in self.api.get_thumbnails(items, max_workers=3))
+        self.assertEqual(results[items[0]], (six.b('a'), 'image/png'))
+        self.assertEqual(results[items[1]], (six.b('b'), 'image/png'))
+        self.assertIsInstance(results[items[2]][0], BoxViewError)
+
     @patch.object(Session, 'request')
     def test_get_thumbnail_to_file(self, mock_request):
         response = Response()
@@ -364,6 +1072,49 @@ class BoxViewTestCase(unittest.TestCase):
         except OSError:
             pass
 
+    @patch.object(Session, 'request')
+    def test_get_realtime_events(self, mock_request):
+        def _stream(content):
+            response = Response()
+            response.status_code = 200
+            response.headers['Content-Type'] = 'text/event-stream'
+            response.raw = six.BytesIO(six.b(content))
+            return response
+
+        mock_request.side_effect = [
+            _stream('retry: 0\nid: 1\ndata: {"page": 1}\n\nid: 2\ndata: {"pa'),
+            _stream('id: 2\ndata: {"page": 2}\n\n'
+                    'id: 3\nevent: finished\ndata: {}\n\n'),
+        ]
+        session_id = TEST_SESSION['id']
+        events = list(self.api.get_realtime_events(session_id))
+        self.assertEqual([e.id for e in events], ['1', '2', '3'])
+        self.assertEqual(events[-1].event, 'finished')
+
+        url = self.api.get_realtime_url(session_id)
+        self.assertEqual(mock_request.call_args_list[0][0], ('GET', url))
+        headers = mock_request.call_args[1]['headers']
+        self.assertEqual(headers['Last-Event-ID'], '1')
+
+        # failed reconnects are retried and counted
+        mock_request.side_effect = [
+            _stream('retry: 0\nid: 1\ndata: {}\n\n'),
+            ConnectionError('connection refused'),
+            Timeout('connect timeout'),
+            _stream('id: 2\nevent: finished\ndata: {}\n\n'),
+        ]
+        events = list(self.api.get_realtime_events(session_id))
+        self.assertEqual([e.id for e in events], ['1', '2'])
+
+        mock_request.side_effect = [
+            _stream('retry: 0\nid: 1\ndata: {}\n\n'),
+            ConnectionError('connection refused'),
+            ConnectionError('connection refused'),
+        ]
+        events = self.api.get_realtime_events(session_id, max_reconnects=2)
+        self.assertEqual(next(events).id, '1')
+        self.assertRaises(ConnectionError, list, events)
+
     @patch.object(Session, 'request')
     def test_create_storage_profile(self, mock_request):
         response = Response()
@@ -426,5 +1177,831 @@ class BoxViewTestCase(unittest.TestCase):
         self.api.delete_webhook()
 
 
+class FileCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = FileCache(self.directory, max_size=270)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def put(self, key, content, mimetype='image/png'):
+        writer = self.cache.writer(key, mimetype)
+        writer.write(content)
+        writer.commit()
+
+    def test_get(self):
+        self.assertIsNone(self.cache.get(('a', 'thumbnail', '10x10')))
+        self.put(('a', 'thumbnail', '10x10'), six.b('test'))
+
+        stream = six.BytesIO()
+        with self.cache.get(('a', 'thumbnail', '10x10')) as entry:
+            entry.write_to(stream)
+        self.assertEqual(stream.getvalue(), six.b('test'))
+        self.assertEqual(entry.mimetype, 'image/png')
+
+    def test_evict(self):
+        for key in 'abc':
+            self.put((key,), six.b('x') * 60)
+            path = self.cache._path((key,))
+            os.utime(path, (ord(key), ord(key)))
+        self.cache.get(('a',)).close()  # `a` is recently used now
+
+        self.put(('d',), six.b('x') * 60)
+        self.assertIsNone(self.cache.get(('b',)))
+        for key in 'acd':
+            self.cache.get((key,)).close()
+
+    def test_evict_shared(self):
+        now = [0.0]
+        self.cache = FileCache(self.directory, max_size=270,
+                               rescan_interval=10.0, clock=lambda: now[0])
+        # another process writing to the same directory
+        other = FileCache(self.directory, max_size=270)
+        for key in 'abcd':
+            cache = self.cache if key in 'ac' else other
+            writer = cache.writer((key,), 'image/png')
+            writer.write(six.b('x') * 60)
+            writer.commit()
+            path = self.cache._path((key,))
+            os.utime(path, (ord(key), ord(key)))
+
+        now[0] = 10.0
+        self.put(('e',), six.b('x') * 60)
+        for key in 'ab':
+            self.assertIsNone(self.cache.get((key,)))
+        for key in 'cde':
+            self.cache.get((key,)).close()
+
+    def test_evict_scans(self):
+        self.cache = FileCache(self.directory, max_size=100 * 1024,
+                               clock=lambda: 0.0)
+        entries = self.cache._entries
+        scans = []
+
+        def _entries():
+            scans.append(1)
+            return entries()
+        self.cache._entries = _entries
+
+        for i in range(400):
+            self.put((i,), six.b('x') * 1024)
+        # directory is scanned once per eviction of 20% of the cache
+        self.assertLessEqual(len(scans), 25)
+        self.assertLessEqual(self.cache.size, 100 * 1024)
+
+    @patch.object(Session, 'request')
+    def test_boxview_cache(self, mock_request):
+        response = Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'image/png'
+        response.raw = six.BytesIO(six.b('test'))
+        mock_request.return_value = response
+
+        api = BoxView('<box view api key>', cache=self.cache)
+        for _ in range(2):
+            result = api.get_thumbnail_to_string(TEST_DOCUMENT['id'], 10, 10)
+            self.assertEqual(result, (six.b('test'), 'image/png'))
+        self.assertEqual(mock_request.call_count, 1)
+
+
+class MetadataCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = MetadataCache(max_entries=2, clock=lambda: self.now)
+
+    def test_ttl(self):
+        self.cache.set('a', dict(TEST_DOCUMENT, status='processing'))
+        self.cache.set('b', dict(TEST_DOCUMENT, status='done'))
+        self.now = 10
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('b'))
+
+        self.cache.set('c', TEST_DOCUMENT)
+        self.cache.set('d', TEST_DOCUMENT)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(len(self.cache), 2)
+
+    @patch.object(Session, 'request')
+    def test_boxview_metadata_cache(self, mock_request):
+        def _request(method, url, **kwargs):
+            time.sleep(0.1)
+            response = Response()
+            response.status_code = 200 if method == 'GET' else 204
+            response._content = json.dumps(TEST_DOCUMENT)
+            return response
+        mock_request.side_effect = _request
+
+        api = BoxView('<box view api key>', metadata_cache=self.cache)
+        results = []
+
+        def _get():
+            results.append(api.get_document(TEST_DOCUMENT['id']))
+        threads = [threading.Thread(target=_get) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [TEST_DOCUMENT] * 10)
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertTrue(api.ready_to_view(TEST_DOCUMENT['id']))
+        self.assertEqual(mock_request.call_count, 1)
+
+        api.delete_document(TEST_DOCUMENT['id'])
+        self.assertIsNone(self.cache.get(TEST_DOCUMENT['id']))
+
+
+class MetricsTestCase(unittest.TestCase):
+
+    @patch.object(Session, 'request')
+    def test_instruments(self, mock_request):
+        unavailable = Response()
+        unavailable.status_code = 503
+        unavailable.raw = six.BytesIO()
+        response = Response()
+        response.status_code = 200
+        response._content = json.dumps(TEST_DOCUMENT)
+        response.elapsed = datetime.timedelta(seconds=0.25)
+        mock_request.side_effect = [unavailable, response, unavailable]
+
+        calls = []
+
+        class Recorder(Instrument):
+            def before(self, info):
+                calls.append(('before', info.method, info.endpoint))
+
+            def after(self, info):
+                calls.append(('after', info.status, info.attempts,
+                              info.ttfb, info.bytes_sent))
+
+            def error(self, info):
+                calls.append(('error', info.status, info.error))
+
+        collector = MetricsCollector()
+        retry = RetryPolicy(max_attempts=2, sleep=lambda delay: None)
+        api = BoxView('<box view api key>', retry=retry,
+                      instruments=[Recorder(), collector])
+        api.update_document(TEST_DOCUMENT['id'], 'name')
+        self.assertEqual(calls[0], ('before', 'PUT', 'documents/{id}'))
+        self.assertEqual(calls[1][:4], ('after', 200, 2, 0.25))
+        self.assertTrue(calls[1][4] > 0)
+
+        retry.max_attempts = 1
+        self.assertRaises(BoxViewError, api.get_document, 'abc')
+        self.assertEqual(calls[3][:2], ('error', 503))
+
+        summary = collector.summary()
+        self.assertEqual(summary['PUT documents/{id}']['retries'], 1)
+        self.assertEqual(summary['GET documents/{id}']['errors'], 1)
+        text = collector.to_prometheus()
+        self.assertIn('boxview_requests_total{method="GET",'
+                      'endpoint="documents/{id}",status="503"} 1', text)
+        self.assertIn('boxview_request_ttfb_seconds_bucket{method="PUT",'
+                      'endpoint="documents/{id}",le="+Inf"} 1', text)
+
+    @patch.object(Session, 'request')
+    def test_bytes_sent_form(self, mock_request):
+        response = Response()
+        response.status_code = 200
+        response._content = json.dumps(TEST_DOCUMENT)
+        mock_request.return_value = response
+
+        sent = []
+
+        class Recorder(Instrument):
+            def after(self, info):
+                sent.append(info.bytes_sent)
+
+        api = BoxView('<box view api key>', instruments=[Recorder()])
+        url = urljoin(api.upload_url, 'documents')
+        api.request('POST', url, data={'name': 'test'})
+        api.request('POST', url, files={'file': six.BytesIO(six.b('x'))})
+        api.request('POST', url, data=six.b('{}'))
+        self.assertEqual(sent, [None, None, 2])
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(1, 2, 4))
+        self.assertIsNone(histogram.percentile(50))
+        for value in (0.5, 1.5, 1.5, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.percentile(20), 1)
+        self.assertEqual(histogram.percentile(50), 1.75)
+        self.assertEqual(histogram.percentile(99), 4)
+
+
+class EventParserTestCase(unittest.TestCase):
+
+    def test_feed(self):
+        parser = EventParser()
+        self.assertEqual(parser.feed(six.b(': ping\r\nid: 7\r\nda')), [])
+        self.assertEqual(parser.feed(six.b('ta: a\r\ndata:b\r')), [])
+        events = parser.feed(six.b(
+            '\n\r\nevent: finished\ndata: c\n\n'))
+        self.assertEqual([tuple(e) for e in events],
+                         [('7', 'message', 'a\nb'), ('7', 'finished', 'c')])
+        self.assertEqual(parser.buffer, six.b(''))
+
+
+class RateLimiterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.slept = []
+
+        def sleep(seconds):
+            self.slept.append(seconds)
+            self.now += seconds
+
+        self.limiter = RateLimiter(2, clock=lambda: self.now, sleep=sleep)
+
+    def test_rate(self):
+        for _ in range(5):
+            self.limiter.acquire()
+        self.assertEqual(self.slept, [0.5, 0.5, 0.5])
+
+    def test_pause(self):
+        self.limiter.pause(10)
+        self.limiter.pause(5)  # shorter pause doesn't shorten current one
+        self.limiter.acquire()
+        self.assertEqual(self.now, 10.5)
+
+
+class DocumentWatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.api = BoxView('<box view api key>')
+        self.now = 0.0
+        self.statuses = {}
+        self.urls = []
+
+    def _request(self, method, url, **kwargs):
+        self.urls.append(url)
+        response = Response()
+        response.status_code = 200
+        if url.endswith('/documents'):
+            entries = [dict(TEST_DOCUMENT, id=doc_id, status=status)
+                       for doc_id, status in self.statuses.items()]
+            content = {'document_collection': {
+                'total_count': len(entries), 'entries': entries}}
+        else:
+            doc_id = url.rsplit('/', 1)[-1]
+            if doc_id not in self.statuses:
+                response.status_code = 404
+                response.raw = six.BytesIO()
+                return response
+            if self.statuses[doc_id] is None:
+                response.status_code = 503
+                response.raw = six.BytesIO()
+                return response
+            content = dict(TEST_DOCUMENT, id=doc_id,
+                           status=self.statuses[doc_id])
+        response._content = json.dumps(content)
+        return response
+
+    @patch.object(Session, 'request')
+    def test_poll(self, mock_request):
+        mock_request.side_effect = self._request
+        watcher = DocumentWatcher(self.api, min_interval=1, max_interval=10,
+                                  clock=lambda: self.now)
+        self.statuses = {'a': 'processing', 'b': 'queued'}
+        watcher.add('a')
+        watcher.add(dict(TEST_DOCUMENT, id='b', status='queued'))
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(len(self.urls), 2)
+
+        # nothing is due yet
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(len(self.urls), 2)
+
+        self.now = 1
+        self.statuses['a'] = 'done'
+        finished = watcher.poll()
+        self.assertEqual([doc['id'] for doc in finished], ['a'])
+        self.assertEqual(len(watcher), 1)
+
+    @patch.object(Session, 'request')
+    def test_poll_errors(self, mock_request):
+        mock_request.side_effect = self._request
+        watcher = DocumentWatcher(self.api, min_interval=1, max_interval=10,
+                                  clock=lambda: self.now)
+        self.statuses = {'a': 'done', 'busy': None, 'b': 'done'}
+        for doc_id in ('a', 'gone', 'busy', 'b'):
+            watcher.add(doc_id)
+
+        finished = watcher.poll()
+        self.assertEqual(sorted((doc['id'], doc['status'])
+                                for doc in finished),
+                         [('a', 'done'), ('b', 'done'), ('gone', 'error')])
+        self.assertEqual(watcher.error.response.status_code, 503)
+        self.assertEqual(len(watcher), 1)
+
+        # failed document is backed off
+        self.now = 5
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(len(self.urls), 4)
+
+        self.now = 10
+        self.statuses['busy'] = 'done'
+        self.assertEqual([doc['id'] for doc in watcher.poll()], ['busy'])
+
+    @patch.object(Session, 'request')
+    def test_poll_with_listing(self, mock_request):
+        mock_request.side_effect = self._request
+        watcher = DocumentWatcher(self.api, list_threshold=3,
+                                  clock=lambda: self.now)
+        for doc_id in 'abcd':
+            self.statuses[doc_id] = 'done'
+            watcher.add(dict(TEST_DOCUMENT, id=doc_id, status='processing'))
+
+        finished = []
+        watcher.callback = finished.append
+        watcher.poll()
+        self.assertEqual(len(self.urls), 1)
+        self.assertEqual(sorted(doc['id'] for doc in finished), list('abcd'))
+
+    def _documents(self, count, step=1):
+        """ Fake account with `count` documents, newest first. """
+        start = datetime.datetime(2013, 8, 30)
+        documents = [
+            dict(TEST_DOCUMENT, id=str(i), status='done', created_at=(
+                start + datetime.timedelta(seconds=i // step)).isoformat() +
+                'Z')
+            for i in range(count)
+        ]
+        documents.reverse()
+
+        def _request(method, url, params=None, **kwargs):
+            self.urls.append(url)
+            response = Response()
+            response.status_code = 200
+            if url.endswith('/documents'):
+                entries = [
+                    doc for doc in documents
+                    if params.get('created_after', '')[:19] <
+                    doc['created_at'][:19] <=
+                    params.get('created_before', 'Z')[:19]]
+                content = {'document_collection': {
+                    'total_count': len(documents),
+                    'entries': entries[:params['limit']]}}
+            else:
+                content = dict(TEST_DOCUMENT, id=url.rsplit('/', 1)[-1])
+            response._content = json.dumps(content)
+            return response
+        return documents, _request
+
+    def _count_requests(self):
+        gets = [url for url in self.urls if not url.endswith('/documents')]
+        return len(gets), len(self.urls) - len(gets)
+
+    @patch.object(Session, 'request')
+    def test_poll_many(self, mock_request):
+        documents, mock_request.side_effect = self._documents(1200, step=10)
+
+        watcher = DocumentWatcher(self.api, clock=lambda: self.now)
+        for document in documents[100:1100]:
+            watcher.add(dict(document, status='processing'))
+        watcher.add('no-created-at')
+
+        finished = watcher.poll()
+        self.assertEqual(len(finished), 1001)
+        gets, listings = self._count_requests()
+        self.assertEqual(gets, 1)
+        # pages overlap by a second, as API compares `created_before`
+        # inclusively here
+        self.assertLessEqual(listings, 30)
+
+    @patch.object(Session, 'request')
+    def test_poll_sparse(self, mock_request):
+        # account creates a document every second
+        documents, mock_request.side_effect = self._documents(3600)
+
+        # one document waits for an hour, few were just created
+        watcher = DocumentWatcher(self.api, clock=lambda: self.now)
+        for document in documents[:5] + documents[-1:]:
+            watcher.add(dict(document, status='processing'))
+        self.assertEqual(len(watcher.poll()), 6)
+        self.assertEqual(self._count_requests(), (1, 1))
+
+        # every 30th document is due, listing doesn't pay off
+        self.urls = []
+        for document in documents[::30]:
+            watcher.add(dict(document, status='processing'))
+        self.assertEqual(len(watcher.poll()), 120)
+        gets, listings = self._count_requests()
+        self.assertLessEqual(gets + listings, 120 + 120 // 5)
+
+    @patch.object(Session, 'request')
+    def test_add_model(self, mock_request):
+        def _request(method, url, **kwargs):
+            if method == 'POST':
+                self.statuses['a'] = 'processing'
+                response = Response()
+                response.status_code = 201
+                document = dict(TEST_DOCUMENT, id='a', status='queued')
+                response._content = json.dumps(document)
+                return response
+            return self._request(method, url, **kwargs)
+        mock_request.side_effect = _request
+
+        api = BoxView('<box view api key>', models=True)
+        watcher = DocumentWatcher(api, clock=lambda: self.now)
+        watcher.add(api.create_document(url=TEST_URL))
+        self.assertEqual(len(watcher), 1)
+
+        self.statuses['a'] = 'done'
+        finished = watcher.poll()
+        self.assertEqual([doc.id for doc in finished], ['a'])
+        self.assertIsInstance(finished[0], Document)
+
+    @patch.object(Session, 'request')
+    def test_wait(self, mock_request):
+        mock_request.side_effect = self._request
+        watcher = DocumentWatcher(self.api, min_interval=0.01)
+        self.statuses = {'a': 'processing', 'b': 'error'}
+        watcher.add('a')
+        watcher.add('b')
+
+        def _convert(document):
+            self.statuses['a'] = 'done'
+        watcher.callback = _convert
+
+        result = [doc['id'] for doc in watcher.wait(timeout=5)]
+        self.assertEqual(sorted(result), ['a', 'b'])
+
+
+TEST_WEBHOOK_EVENTS = [
+    {
+        'type': 'document.viewable',
+        'data': {'type': 'document', 'id': 'a'},
+        'created_at': '2013-08-30T00:17:37Z',
+    },
+    {
+        'type': 'document.done',
+        'data': {'type': 'document', 'id': 'a'},
+        'created_at': '2013-08-30T00:17:39Z',
+    },
+    {
+        'type': 'document.error',
+        'data': {'type': 'document', 'id': 'b'},
+        'created_at': '2013-08-30T00:17:39Z',
+    },
+]
+
+
+class SessionPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.api = BoxView('<box view api key>')
+        self.now = 0.0
+        self.created = []
+        self.deleted = []
+
+    def _request(self, method, url, **kwargs):
+        response = Response()
+        if method == 'DELETE':
+            self.deleted.append(url.rsplit('/', 1)[-1])
+            response.status_code = 204
+            return response
+        session_id = 'session{}'.format(len(self.created))
+        self.created.append(session_id)
+        content = dict(TEST_SESSION, id=session_id,
+                       expires_at='2014-01-01T01:00:00Z')
+        response.status_code = 201
+        response._content = json.dumps(content)
+        return response
+
+    def _pool(self, **kwargs):
+        return SessionPool(self.api, clock=lambda: self.now,
+                           utcnow=lambda: datetime.datetime(2014, 1, 1),
+                           **kwargs)
+
+    @patch.object(Session, 'request')
+    def test_get(self, mock_request):
+        mock_request.side_effect = self._request
+        pool = self._pool(size=2, duration=120, min_ttl=600)
+        pool.add('doc')
+        self.assertEqual(pool.refresh(), 3600 - 600)
+        self.assertEqual(self.created, ['session0', 'session1'])
+
+        self.assertEqual(pool.get('doc')['id'], 'session0')
+        self.assertTrue(pool.get_url('doc').endswith('/session1/view'))
+        self.assertEqual(pool.get('doc')['id'], 'session2')
+        self.assertEqual((pool.hits, pool.misses), (2, 1))
+
+        pool.refresh()
+        self.assertEqual(len(self.created), 5)
+        self.assertEqual(self.deleted, [])
+
+        # sessions close to expiration are replaced
+        self.now = 3100
+        pool.refresh()
+        self.assertEqual(self.deleted, ['session3', 'session4'])
+        self.assertEqual(len(self.created), 7)
+
+        pool.close()
+        self.assertEqual(self.deleted[2:], ['session5', 'session6'])
+
+    @patch.object(Session, 'request')
+    def test_eviction(self, mock_request):
+        mock_request.side_effect = self._request
+        pool = self._pool(size=1, max_documents=1)
+        pool.add('a')
+        pool.refresh()
+        pool.add('b')
+        pool.refresh()
+        self.assertEqual(list(pool.documents), ['b'])
+        self.assertEqual(self.deleted, ['session0'])
+        self.assertEqual(len(self.created), 2)
+
+    @patch.object(Session, 'request')
+    def test_errors(self, mock_request):
+        statuses = {'deleted': 404, 'broken': 500}
+
+        def _request(method, url, **kwargs):
+            status = statuses.get(json.loads(kwargs.get('data') or '{}').get(
+                'document_id'))
+            if status is None:
+                return self._request(method, url, **kwargs)
+            response = Response()
+            response.status_code = status
+            return response
+        mock_request.side_effect = _request
+
+        pool = self._pool(size=2)
+        for document_id in ('a', 'deleted', 'broken', 'b'):
+            pool.add(document_id)
+        self.assertEqual(pool.refresh(), 5.0)
+        self.assertIsInstance(pool.error, BoxViewError)
+        counts = dict((document_id, len(sessions))
+                      for document_id, sessions in pool.documents.items())
+        self.assertEqual(counts, {'a': 2, 'broken': 0, 'b': 2})
+        self.assertFalse(pool._missing())
+
+        # broken document is tried again after the delay
+        del statuses['broken']
+        pool.refresh()
+        self.assertEqual(len(pool.documents['broken']), 0)
+        self.now = 5.0
+        pool.refresh()
+        self.assertEqual(len(pool.documents['broken']), 2)
+        self.assertIsNone(pool.error)
+
+
+class WebhookReceiverTestCase(unittest.TestCase):
+
+    def post(self, app, body, method='POST'):
+        from wsgiref.util import setup_testing_defaults
+
+        environ = {
+            'REQUEST_METHOD': method,
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': six.BytesIO(body),
+        }
+        setup_testing_defaults(environ)
+        statuses = []
+        app(environ, lambda status, headers: statuses.append(status))
+        return statuses[0]
+
+    def test_dispatch(self):
+        queue = six.moves.queue.Queue()
+        receiver = WebhookReceiver(queue=queue)
+        done = []
+        receiver.subscribe(done.append, 'document.done')
+
+        body = six.b(json.dumps(TEST_WEBHOOK_EVENTS))
+        self.assertEqual(self.post(receiver, body), '200 OK')
+        self.assertEqual(queue.qsize(), 3)
+        self.assertEqual([(e.document_id, e.status) for e in done],
+                         [('a', 'done')])
+
+        self.assertEqual(self.post(receiver, six.b('{')),
+                         '400 Bad Request')
+        self.assertEqual(self.post(receiver, six.b(''), 'GET'),
+                         '405 Method Not Allowed')
+
+    def test_watcher(self):
+        watcher = DocumentWatcher(BoxView('<box view api key>'),
+                                  polling=False)
+        watcher.add('a')
+        watcher.add('b')
+        receiver = WebhookReceiver()
+        receiver.attach(watcher)
+        receiver.dispatch(json.dumps(TEST_WEBHOOK_EVENTS))
+
+        result = [(doc['id'], doc['status']) for doc in watcher.wait(1)]
+        self.assertEqual(result, [('a', 'done'), ('b', 'error')])
+
+
+def _resolved(value=None, exception=None):
+    future = asyncio.get_event_loop().create_future()
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(value)
+    return future
+
+
+class FakeAsyncContent(object):
+
+    def __init__(self, content):
+        self.chunks = [content]
+
+    def iter_chunked(self, size):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        if self.chunks:
+            return _resolved(self.chunks.pop(0))
+        return _resolved(exception=StopAsyncIteration())
+
+
+class FakeAsyncResponse(object):
+
+    def __init__(self, status, content=b'', headers=None, reason='OK'):
+        self.status = status
+        self.reason = reason
+        self.url = API_URL
+        self.headers = headers or {}
+        self._body = content
+        self.content = FakeAsyncContent(content)
+
+    def read(self):
+        return _resolved(self._body)
+
+    def release(self):
+        pass
+
+
+class FakeAsyncSession(object):
+
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        return _resolved(self.response)
+
+
+@unittest.skipIf(AsyncBoxView is None, 'aiohttp is not available')
+class AsyncBoxViewTestCase(unittest.TestCase):
+
+    def run_async(self, response, method, *args, **kwargs):
+        session = FakeAsyncSession(response)
+        api = AsyncBoxView('<box view api key>', session=session)
+        loop = asyncio.new_event_loop()
+        try:
+            result = loop.run_until_complete(
+                getattr(api, method)(*args, **kwargs))
+        finally:
+            loop.close()
+        return result, session
+
+    def test_get_document(self):
+        response = FakeAsyncResponse(200, six.b(json.dumps(TEST_DOCUMENT)))
+        result, session = self.run_async(response, 'get_document',
+                                         TEST_DOCUMENT['id'])
+        self.assertEqual(result, TEST_DOCUMENT)
+
+        method, url, kwargs = session.calls[0]
+        self.assertEqual(method, 'GET')
+        self.assertEqual(url, urljoin(API_URL, 'documents/{}'.format(
+            TEST_DOCUMENT['id'])))
+        self.assertTrue(kwargs['headers']['Authorization'].startswith(
+            'Token '))
+
+    def test_get_thumbnail_to_string(self):
+        response = FakeAsyncResponse(200, six.b('test'),
+                                     headers={'Content-Type': 'image/png'})
+        result, _ = self.run_async(response, 'get_thumbnail_to_string',
+                                   TEST_DOCUMENT['id'], 100, 100)
+        self.assertEqual(result, (six.b('test'), 'image/png'))
+
+    def test_request_errors(self):
+        response = FakeAsyncResponse(202, headers={'Retry-After': '10'})
+        try:
+            self.run_async(response, 'get_thumbnail_to_string',
+                           TEST_DOCUMENT['id'], 100, 100)
+        except RetryAfter as e:
+            self.assertEqual(e.seconds, 10.0)
+        else:
+            self.assertTrue(False)
+
+        response = FakeAsyncResponse(401, six.b('Unauthorized'),
+                                     reason='Unauthorized')
+        self.assertRaises(BoxViewError, self.run_async, response,
+                          'get_document', TEST_DOCUMENT['id'])
+
+    def test_asgi_webhook(self):
+        receiver = WebhookReceiver()
+        events = []
+        receiver.subscribe(events.append)
+        app = asgi_webhook(receiver)
+
+        body = six.b(json.dumps(TEST_WEBHOOK_EVENTS))
+        sent = []
+
+        def receive():
+            return _resolved({'type': 'http.request', 'body': body})
+
+        def send(message):
+            sent.append(message)
+            return _resolved()
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(
+                app({'type': 'http', 'method': 'POST'}, receive, send))
+        finally:
+            loop.close()
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertEqual(len(events), 3)
+
+
+class CLITestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def run_cli(self, *argv):
+        stdout = six.StringIO()
+        with patch('sys.stdout', stdout):
+            code = cli_main(list(argv) + ['--api-key', '<box view api key>'])
+        lines = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        return code, lines
+
+    @patch.object(Session, 'request')
+    def test_status(self, mock_request):
+        def _request(method, url, **kwargs):
+            response = Response()
+            if url.endswith('missing'):
+                response.status_code = 404
+                response._content = json.dumps({'message': 'Not found'})
+            else:
+                response.status_code = 200
+                response._content = json.dumps(TEST_DOCUMENT)
+            return response
+        mock_request.side_effect = _request
+
+        filename = os.path.join(self.tmp_dir, 'ids.csv')
+        with open(filename, 'w') as fp:
+            fp.write('id,name\n{},Leaves of Grass\nmissing,\n'.format(
+                TEST_DOCUMENT['id']))
+
+        code, lines = self.run_cli('status', '-i', filename, '-j', '2')
+        self.assertEqual(code, 1)
+        results = dict((line['id'], line) for line in lines[:-1])
+        self.assertEqual(results[TEST_DOCUMENT['id']]['status'], 'done')
+        self.assertTrue(results[TEST_DOCUMENT['id']]['ok'])
+        self.assertFalse(results['missing']['ok'])
+        self.assertEqual(results['missing']['status_code'], 404)
+        summary = lines[-1]['summary']
+        self.assertEqual((summary['done'], summary['failed']), (1, 1))
+
+    @patch.object(Session, 'request')
+    def test_thumbnails(self, mock_request):
+        response = Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'image/png'
+        response.raw = six.BytesIO(six.b('png'))
+        mock_request.return_value = response
+
+        code, lines = self.run_cli('thumbnails', TEST_DOCUMENT['id'],
+                                   '-o', self.tmp_dir, '--width', '100',
+                                   '--height', '50')
+        self.assertEqual(code, 0)
+        filename = os.path.join(
+            self.tmp_dir, '{}_100x50.png'.format(TEST_DOCUMENT['id']))
+        self.assertEqual(lines[0]['path'], filename)
+        self.assertEqual(lines[-1]['summary']['bytes'], 3)
+        with open(filename, 'rb') as fp:
+            self.assertEqual(fp.read(), six.b('png'))
+
+    @patch.object(Session, 'request')
+    def test_purge_dry_run(self, mock_request):
+        response = Response()
+        response.status_code = 200
+        response._content = json.dumps({'document_collection': {'total_count': 1, 'entries': [TEST_DOCUMENT]}})
+        mock_request.return_value = response
+
+        code, lines = self.run_cli('purge', '--created-before',
+                                   '2013-08-31', '--dry-run')
+        self.assertEqual(code, 0)
+        summary = lines[-1]['summary']
+        self.assertEqual((summary['deleted'], summary['would_delete']),
+                         (0, 1))
+        self.assertTrue(all(call[0][0] == 'GET'
+                            for call in mock_request.call_args_list))
+
+
 if __name__ == '__main__':
     unittest.main()